@@ -1,5 +1,5 @@
 import logging
-from random import randint
+from random import Random
 import traceback
 from typing import cast, Dict, List, Set, Collection
 
@@ -10,7 +10,6 @@ from geniusweb.actions.Offer import Offer
 from geniusweb.actions.PartyId import PartyId
 from geniusweb.actions.Vote import Vote
 from geniusweb.actions.Votes import Votes
-from geniusweb.bidspace.AllBidsList import AllBidsList
 from geniusweb.inform.ActionDone import ActionDone
 from geniusweb.inform.Finished import Finished
 from geniusweb.inform.Inform import Inform
@@ -19,7 +18,6 @@ from geniusweb.inform.Settings import Settings
 from geniusweb.inform.Voting import Voting
 from geniusweb.inform.YourTurn import YourTurn
 from geniusweb.issuevalue.Bid import Bid
-from geniusweb.issuevalue.Domain import Domain
 from geniusweb.issuevalue.Value import Value
 from geniusweb.issuevalue.ValueSet import ValueSet
 from geniusweb.party.Capabilities import Capabilities
@@ -31,6 +29,8 @@ from geniusweb.profileconnection.ProfileConnectionFactory import (
 from geniusweb.progress.ProgressRounds import ProgressRounds
 from geniusweb.utils import val
 
+from utils.bid_sampler import ThresholdBidSampler
+
 
 class RandomAgent(DefaultParty):
     """
@@ -42,6 +42,8 @@ class RandomAgent(DefaultParty):
         self.getReporter().log(logging.INFO, "party is initialized")
         self._profile = None
         self._lastReceivedBid: Bid = None
+        self._sampler: ThresholdBidSampler = None
+        self._random = Random()
 
     # Override
     def notifyChange(self, info: Inform):
@@ -51,6 +53,10 @@ class RandomAgent(DefaultParty):
             self._me = self._settings.getID()
             self._protocol: str = str(self._settings.getProtocol().getURI())
             self._progress = self._settings.getProgress()
+            # a seed makes the session reproducible
+            seed = self._settings.getParameters().get("seed")
+            if seed is not None:
+                self._random.seed(seed)
             if "Learn" == self._protocol:
                 self.getConnection().send(LearningDone(self._me))  # type:ignore
             else:
@@ -101,11 +107,7 @@ class RandomAgent(DefaultParty):
         if self._isGood(self._lastReceivedBid):
             action = Accept(self._me, self._lastReceivedBid)
         else:
-            for _attempt in range(20):
-                bid = self._getRandomBid(self._profile.getProfile().getDomain())
-                if self._isGood(bid):
-                    break
-            action = Offer(self._me, bid)
+            action = Offer(self._me, self._getSampler().sample())
         self.getConnection().send(action)
 
     def _isGood(self, bid: Bid) -> bool:
@@ -116,9 +118,15 @@ class RandomAgent(DefaultParty):
             return profile.getUtility(bid) > 0.6
         raise Exception("Can not handle this type of profile")
 
-    def _getRandomBid(self, domain: Domain) -> Bid:
-        allBids = AllBidsList(domain)
-        return allBids.get(randint(0, allBids.size() - 1))
+    def _getSampler(self) -> ThresholdBidSampler:
+        """
+        @return sampler of random bids that are good (see {@link #_isGood}), built
+                once per profile.
+        """
+        profile = self._profile.getProfile()
+        if self._sampler is None or self._sampler.getProfile() is not profile:
+            self._sampler = ThresholdBidSampler(profile, 0.6, strict=True, rng=self._random)
+        return self._sampler
 
     def _vote(self, voting: Voting) -> Votes:
         """
@@ -1,12 +1,12 @@
 import logging
-from random import randint
+from random import Random
+from time import time
 from typing import cast
 
 from geniusweb.actions.Accept import Accept
 from geniusweb.actions.Action import Action
 from geniusweb.actions.Offer import Offer
 from geniusweb.actions.PartyId import PartyId
-from geniusweb.bidspace.AllBidsList import AllBidsList
 from geniusweb.inform.ActionDone import ActionDone
 from geniusweb.inform.Finished import Finished
 from geniusweb.inform.Inform import Inform
@@ -22,8 +22,13 @@ from geniusweb.profile.utilityspace.UtilitySpace import UtilitySpace
 from geniusweb.profileconnection.ProfileConnectionFactory import (
     ProfileConnectionFactory,
 )
+from geniusweb.progress.Progress import Progress
 from geniusweb.progress.ProgressRounds import ProgressRounds
 
+# the sampler is shared with the other agents of this repository, a submission must contain all
+# files that the agent uses: copy utils/bid_sampler.py and the modules it imports into your agent
+from utils.bid_sampler import ThresholdBidSampler
+
 
 class TemplateAgent(DefaultParty):
     """
@@ -35,6 +40,9 @@ class TemplateAgent(DefaultParty):
         self.getReporter().log(logging.INFO, "party is initialized")
         self._profile = None
         self._last_received_bid: Bid = None
+        self._sampler: ThresholdBidSampler = None
+        # use this source of randomness (instead of the random module) to make sessions reproducible
+        self._random = Random()
 
     def notifyChange(self, info: Inform):
         """This is the entry point of all interaction with your agent after is has been initialised.
@@ -50,7 +58,12 @@ class TemplateAgent(DefaultParty):
             self._me = self._settings.getID()
 
             # progress towards the deadline has to be tracked manually through the use of the Progress object
-            self._progress: ProgressRounds = self._settings.getProgress()
+            self._progress: Progress = self._settings.getProgress()
+
+            # the seed parameter is set by the session runner to make sessions reproducible
+            seed = self._settings.getParameters().get("seed")
+            if seed is not None:
+                self._random.seed(seed)
 
             # the profile contains the preferences of the agent over the domain
             self._profile = ProfileConnectionFactory.create(
@@ -72,8 +85,9 @@ class TemplateAgent(DefaultParty):
             # execute a turn
             self._myTurn()
 
-            # log that we advanced a turn
-            self._progress = self._progress.advance()
+            # log that we advanced a turn (time based progress advances by itself)
+            if isinstance(self._progress, ProgressRounds):
+                self._progress = self._progress.advance()
 
         # Finished will be send if the negotiation has ended (through agreement or deadline)
         elif isinstance(info, Finished):
@@ -129,20 +143,28 @@ class TemplateAgent(DefaultParty):
             return False
         profile = self._profile.getProfile()
 
-        progress = self._progress.get(0)
+        # progress is a value between 0 and 1, the current time (in ms) is only used
+        # by time based deadlines, a deadline in rounds ignores it
+        progress = self._progress.get(round(time() * 1000))
 
         # very basic approach that accepts if the offer is valued above 0.6 and
-        # 80% of the rounds towards the deadline have passed
+        # 80% of the time towards the deadline has passed
         return profile.getUtility(bid) > 0.6 and progress > 0.8
 
     def _findBid(self) -> Bid:
-        # compose a list of all possible bids
-        domain = self._profile.getProfile().getDomain()
-        all_bids = AllBidsList(domain)
-
-        # take 50 attempts at finding a random bid that is acceptable to us
-        for _ in range(50):
-            bid = all_bids.get(randint(0, all_bids.size() - 1))
-            if self._isGood(bid):
-                break
-        return bid
+        profile = self._profile.getProfile()
+        progress = self._progress.get(round(time() * 1000))
+
+        # the sampler sorts all possible bids by utility once, after which it can
+        # directly draw a random bid with a utility above a threshold
+        if self._sampler is None or self._sampler.getProfile() is not profile:
+            self._sampler = ThresholdBidSampler(profile, rng=self._random)
+
+        # like _isGood, only bids valued above 0.6 are good enough once 80% of the time
+        # towards the deadline has passed, before that any random bid is offered
+        if progress > 0.8:
+            self._sampler.setThreshold(0.6, strict=True)
+        else:
+            self._sampler.setThreshold(0.0)
+
+        return self._sampler.sample()
@@ -1,12 +1,8 @@
-from geniusweb.bidspace.BidsWithUtility import BidsWithUtility
-from geniusweb.bidspace.Interval import Interval
-from geniusweb.bidspace.IssueInfo import IssueInfo
-from geniusweb.issuevalue.Bid import Bid
-from geniusweb.issuevalue.Value import Value
 from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
-from tudelft.utilities.immutablelist.ImmutableList import ImmutableList
 from decimal import Decimal
-from typing import List
+from typing import List, Union
+from agents.time_dependent_agent.sorted_bid_index import BidsView, SortedBidIndex
+from utils.utility_evaluator import UtilityEvaluator
 
 
 class ExtendedUtilSpace:
@@ -17,22 +13,39 @@ class ExtendedUtilSpace:
 
     def __init__(self, space: LinearAdditive):
         self._utilspace = space
-        self._bidutils = BidsWithUtility.create(self._utilspace)
+        # enumerates the full bid space, so it is only built when needed
+        self._sortedbids: SortedBidIndex = None  # type:ignore
+        self._weightedUtils = self._computeWeightedUtils()
         self._computeMinMax()
         self._tolerance = self._computeTolerance()
 
+    def _computeWeightedUtils(self) -> List[List[Decimal]]:
+        """
+        @return for every issue, the weighted utilities of its values.
+        """
+        domain = self._utilspace.getDomain()
+        utilities = self._utilspace.getUtilities()
+        return [
+            [
+                self._utilspace.getWeight(issue) * utilities[issue].getUtility(value)
+                for value in domain.getValues(issue)
+            ]
+            for issue in sorted(domain.getIssues())
+        ]
+
     def _computeMinMax(self):
         """
         Computes the fields minutil and maxUtil.
         <p>
-        TODO this is simplistic, very expensive method and may cause us to run
-        out of time on large domains.
+        The utility space is linear additive, so the minimum (maximum) utility is
+        the sum of the minimum (maximum) weighted utility of every issue. This
+        takes time linear in the number of issue values instead of the number of
+        bids.
         <p>
-        Assumes that utilspace and bidutils have been set properly.
+        Assumes that utilspace and weightedUtils have been set properly.
         """
-        range = self._bidutils.getRange()
-        self._minUtil = range.getMin()
-        self._maxUtil = range.getMax()
+        self._minUtil = sum((min(values) for values in self._weightedUtils), Decimal(0))
+        self._maxUtil = sum((max(values) for values in self._weightedUtils), Decimal(0))
 
         rvbid = self._utilspace.getReservationBid()
         if rvbid != None:
@@ -51,14 +64,10 @@ class ExtendedUtilSpace:
                 value.
         """
         tolerance = Decimal(1)
-        for iss in self._bidutils.getInfo():
-            if iss.getValues().size() > 1:
+        for weightedUtils in self._weightedUtils:
+            if len(weightedUtils) > 1:
                 # we have at least 2 values.
-                values: List[Decimal] = []
-                for val in iss.getValues():
-                    values.append(iss.getWeightedUtil(val))
-                values.sort()
-                values.reverse()
+                values: List[Decimal] = sorted(weightedUtils, reverse=True)
                 tolerance = min(tolerance, values[0] - values[1])
         return tolerance
 
@@ -68,12 +77,16 @@ class ExtendedUtilSpace:
     def getMax(self) -> Decimal:
         return self._maxUtil
 
-    def getBids(self, utilityGoal: Decimal) -> ImmutableList[Bid]:
+    def getBids(self, utilityGoal: Union[Decimal, float]) -> BidsView:
         """
-        @param utilityGoal the requested utility
+        @param utilityGoal the requested utility, as Decimal or float
         @return bids with utility inside [utilitygoal-{@link #tolerance},
-                utilitygoal]
+                utilitygoal], as a lazy view on the bids sorted by utility.
         """
-        return self._bidutils.getBids(
-            Interval(utilityGoal - self._tolerance, utilityGoal)
-        )
+        if self._sortedbids is None:
+            self._sortedbids = SortedBidIndex(UtilityEvaluator(self._utilspace))
+        if isinstance(utilityGoal, float):
+            low = utilityGoal - float(self._tolerance)
+        else:
+            low = float(utilityGoal - self._tolerance)
+        return self._sortedbids.getBids(low, float(utilityGoal))
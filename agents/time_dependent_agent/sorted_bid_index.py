@@ -0,0 +1,67 @@
+from typing import Iterator
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+
+from utils.utility_evaluator import UtilityEvaluator
+
+
+class BidsView:
+    """
+    Lazy, read-only view on a range of bids of a `SortedBidIndex`. Bids are only
+    created when they are accessed. Supports the `size`/`get` interface of
+    geniusweb's ImmutableList as well as `len`, indexing and iteration.
+    """
+
+    def __init__(self, evaluator: UtilityEvaluator, numbers: np.ndarray):
+        self._evaluator = evaluator
+        self._numbers = numbers
+
+    def size(self) -> int:
+        return len(self._numbers)
+
+    def get(self, index: int) -> Bid:
+        return self._evaluator.decode(self._numbers[index])
+
+    def __len__(self) -> int:
+        return self.size()
+
+    def __getitem__(self, index: int) -> Bid:
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[Bid]:
+        for number in self._numbers:
+            yield self._evaluator.decode(number)
+
+
+class SortedBidIndex:
+    """
+    All bids of a linear additive profile sorted by their utility, built once per
+    profile. Bids with a utility in an interval are found by bisection and returned
+    as a lazy `BidsView`, so a query costs O(log n) regardless of the number of
+    matching bids.
+
+    Utilities are the float64 values of `UtilityEvaluator`, which are the correctly
+    rounded Decimal utilities of geniusweb.
+    """
+
+    def __init__(self, evaluator: UtilityEvaluator):
+        self._evaluator = evaluator
+        utilities = evaluator.getAllUtilities()
+        self._numbers = np.argsort(utilities, kind="stable")
+        self._utilities = utilities[self._numbers]
+
+    def size(self) -> int:
+        return len(self._numbers)
+
+    def getMin(self) -> float:
+        return float(self._utilities[0])
+
+    def getMax(self) -> float:
+        return float(self._utilities[-1])
+
+    def getBids(self, low: float, high: float) -> BidsView:
+        """Bids with a utility in [low, high]."""
+        start = np.searchsorted(self._utilities, low, side="left")
+        stop = np.searchsorted(self._utilities, high, side="right")
+        return BidsView(self._evaluator, self._numbers[start:stop])
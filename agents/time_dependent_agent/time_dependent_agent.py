@@ -1,5 +1,5 @@
 import logging
-from random import randint, random
+from random import Random
 import traceback
 from typing import cast, Dict, List, Set, Collection
 
@@ -30,14 +30,15 @@ from geniusweb.profileconnection.ProfileConnectionFactory import (
 )
 from geniusweb.progress.ProgressRounds import ProgressRounds
 from geniusweb.utils import val
-from geniusweb.profileconnection.ProfileInterface import ProfileInterface
 from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
 from geniusweb.progress.Progress import Progress
-from tudelft.utilities.immutablelist.ImmutableList import ImmutableList
 from time import sleep, time as clock
 from decimal import Decimal
 import sys
 from agents.time_dependent_agent.extended_util_space import ExtendedUtilSpace
+from utils.utility_evaluator import UtilityEvaluator
+from agents.time_dependent_agent.versioned_profile import VersionedProfile
+from agents.time_dependent_agent.sorted_bid_index import BidsView
 from tudelft_utilities_logging.Reporter import Reporter
 
 
@@ -74,6 +75,19 @@ class TimeDependentAgent(DefaultParty):
     to simulate human users that take thinking time.</td>
     </tr>
 
+    <tr>
+    <td>fastutility</td>
+    <td>If true, utilities and utility goals are computed in float64 with a
+    {@link UtilityEvaluator} instead of in Decimal arithmetic. Default value is
+    false.</td>
+    </tr>
+
+    <tr>
+    <td>seed</td>
+    <td>Seed of the random choices of the party (the bid among equally good
+    bids and the delay), to make sessions reproducible. Default is unseeded.</td>
+    </tr>
+
     </table>
     <p>
     TimeDependentParty requires a {@link UtilitySpace}
@@ -81,8 +95,13 @@ class TimeDependentAgent(DefaultParty):
 
     def __init__(self, reporter: Reporter = None):
         super().__init__(reporter)
-        self._profileint: ProfileInterface = None  # type:ignore
+        self._profileint: VersionedProfile = None  # type:ignore
         self._utilspace: LinearAdditive = None  # type:ignore
+        self._utilspaceVersion: int = 0
+        # the utility function used every turn, the float64 view of the utilspace if fastutility is set
+        self._utilfunc = None
+        self._fastutility: bool = False
+        self._floatMinMax = None
         self._me: PartyId = None  # type:ignore
         self._progress: Progress = None  # type:ignore
         self._lastReceivedBid: Bid = None  # type:ignore
@@ -90,6 +109,7 @@ class TimeDependentAgent(DefaultParty):
         self._e: float = 1.2
         self._lastvotes: Votes = None  # type:ignore
         self._settings: Settings = None  # type:ignore
+        self._random = Random()
         self.getReporter().log(logging.INFO, "party is initialized")
 
     # Override
@@ -115,12 +135,20 @@ class TimeDependentAgent(DefaultParty):
                             logging.WARNING,
                             "parameter e should be Double but found " + str(newe),
                         )
+                fastutility = self._settings.getParameters().get("fastutility")
+                if fastutility != None:
+                    self._fastutility = fastutility is True
+                seed = self._settings.getParameters().get("seed")
+                if seed != None:
+                    self._random.seed(seed)
                 protocol: str = str(self._settings.getProtocol().getURI())
                 if "Learn" == protocol:
                     val(self.getConnection()).send(LearningDone(self._me))
                 else:
-                    self._profileint = ProfileConnectionFactory.create(
-                        self._settings.getProfile().getURI(), self.getReporter()
+                    self._profileint = VersionedProfile(
+                        ProfileConnectionFactory.create(
+                            self._settings.getProfile().getURI(), self.getReporter()
+                        )
                     )
 
             elif isinstance(info, ActionDone):
@@ -211,8 +239,8 @@ class TimeDependentAgent(DefaultParty):
         myAction: Action
         if bid == None or (
             self._lastReceivedBid != None
-            and self._utilspace.getUtility(self._lastReceivedBid)
-            >= self._utilspace.getUtility(bid)
+            and self._utilfunc.getUtility(self._lastReceivedBid)
+            >= self._utilfunc.getUtility(bid)
         ):
             # if bid==null we failed to suggest next bid.
             myAction = Accept(self._me, self._lastReceivedBid)
@@ -221,10 +249,23 @@ class TimeDependentAgent(DefaultParty):
         self.getConnection().send(myAction)
 
     def _updateUtilSpace(self) -> LinearAdditive:  # throws IOException
-        newutilspace = self._profileint.getProfile()
-        if not newutilspace == self._utilspace:
-            self._utilspace = cast(LinearAdditive, newutilspace)
+        """
+        Rebuilds the {@link ExtendedUtilSpace} only if the profile changed, which
+        is detected with the cheap version check of {@link VersionedProfile}.
+        """
+        version = self._profileint.getVersion()
+        if version != self._utilspaceVersion:
+            self._utilspace = cast(LinearAdditive, self._profileint.getProfile())
             self._extendedspace = ExtendedUtilSpace(self._utilspace)
+            self._utilspaceVersion = version
+            if self._fastutility:
+                self._utilfunc = UtilityEvaluator(self._utilspace)
+                self._floatMinMax = (
+                    float(self._extendedspace.getMin()),
+                    float(self._extendedspace.getMax()),
+                )
+            else:
+                self._utilfunc = self._utilspace
         return self._utilspace
 
     def _makeBid(self) -> Bid:
@@ -234,18 +275,39 @@ class TimeDependentAgent(DefaultParty):
         """
         time = self._progress.get(round(clock() * 1000))
 
-        utilityGoal = self._getUtilityGoal(
-            time,
-            self.getE(),
-            self._extendedspace.getMin(),
-            self._extendedspace.getMax(),
-        )
-        options: ImmutableList[Bid] = self._extendedspace.getBids(utilityGoal)
+        utilityGoal = self._currentUtilityGoal(time)
+        options: BidsView = self._extendedspace.getBids(utilityGoal)
         if options.size() == 0:
             # if we can't find good bid, get max util bid....
             options = self._extendedspace.getBids(self._extendedspace.getMax())
         # pick a random one.
-        return options.get(randint(0, options.size() - 1))
+        return options.get(self._random.randint(0, options.size() - 1))
+
+    def _currentUtilityGoal(self, t: float):
+        """
+        @param t the time in [0,1], see {@link #_getUtilityGoal}
+        @return the utility goal as float if fastutility is set, else as Decimal
+        """
+        if self._fastutility:
+            return self._getFloatUtilityGoal(t, self.getE(), *self._floatMinMax)
+        return self._getUtilityGoal(
+            t,
+            self.getE(),
+            self._extendedspace.getMin(),
+            self._extendedspace.getMax(),
+        )
+
+    def _getFloatUtilityGoal(
+        self, t: float, e: float, minUtil: float, maxUtil: float
+    ) -> float:
+        """
+        float64 version of {@link #_getUtilityGoal}, without the Decimal
+        rounding of the concession factor.
+        """
+        ft1 = 1.0
+        if e != 0:
+            ft1 = 1 - pow(t, 1 / e)
+        return max(min((minUtil + (maxUtil - minUtil) * ft1), maxUtil), minUtil)
 
     def _getUtilityGoal(
         self, t: float, e: float, minUtil: Decimal, maxUtil: Decimal
@@ -294,15 +356,10 @@ class TimeDependentAgent(DefaultParty):
         """
         if bid == None or self._profileint == None:
             return False
-        profile = cast(LinearAdditive, self._profileint.getProfile())
+        self._updateUtilSpace()
         # the profile MUST contain UtilitySpace
         time = self._progress.get(round(clock() * 1000))
-        return profile.getUtility(bid) >= self._getUtilityGoal(
-            time,
-            self.getE(),
-            self._extendedspace.getMin(),
-            self._extendedspace.getMax(),
-        )
+        return self._utilfunc.getUtility(bid) >= self._currentUtilityGoal(time)
 
     def _delayResponse(self):  # throws InterruptedException
         """
@@ -313,4 +370,4 @@ class TimeDependentAgent(DefaultParty):
         """
         delay = self._settings.getParameters().getDouble("delay", 0, 0, 10000000)
         if delay > 0:
-            sleep(delay * (0.5 + random()))
+            sleep(delay * (0.5 + self._random.random()))
@@ -0,0 +1,38 @@
+from geniusweb.profile.Profile import Profile
+from geniusweb.profileconnection.ProfileInterface import ProfileInterface
+
+
+class VersionedProfile(ProfileInterface):
+    """
+    Profile handle with a version number that only changes when the wrapped
+    profile connection delivers a new profile.
+
+    Profile connections return the same (immutable) profile object until the
+    profile changes, so a change is detected with an identity check instead of
+    a deep equality check over the whole profile. Agents can keep the version
+    that their derived data (e.g. an ExtendedUtilSpace) was built for, and only
+    rebuild when `getVersion` returns a different value.
+    """
+
+    def __init__(self, profileint: ProfileInterface):
+        self._profileint = profileint
+        self._profile: Profile = None  # type:ignore
+        self._version = 0
+
+    def getVersion(self) -> int:
+        """
+        @return the version of the current profile, starting at 1 for the first
+                profile and increased every time the profile changes.
+        """
+        profile = self._profileint.getProfile()
+        if profile is not self._profile:
+            self._profile = profile
+            self._version += 1
+        return self._version
+
+    def getProfile(self) -> Profile:
+        self.getVersion()
+        return self._profile
+
+    def close(self):
+        self._profileint.close()
@@ -0,0 +1,168 @@
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+import numpy as np
+
+from utils.session_runner import run_session
+
+RESULTS_DIR = "results/benchmarks"
+
+# Settings of the benchmark:
+#   Every agent negotiates against itself on every domain for every deadline. Such a combination is a cell.
+#   Every cell is repeated a number of times to obtain stable timings, all sessions of a cell get the same seed,
+#   so that agents that draw random bids negotiate the same number of rounds in every run of the benchmark.
+#   Wall time is measured without instrumentation and memory tracing, the round latency and CPU time in
+#   instrumented runs and the peak memory in an extra run.
+#   The round latency is the time both agents spent on their turns of a round (see utils.instrumentation).
+benchmark_settings = {
+    "agents": [
+        "agents.boulware_agent.boulware_agent.BoulwareAgent",
+        "agents.conceder_agent.conceder_agent.ConcederAgent",
+        "agents.hardliner_agent.hardliner_agent.HardlinerAgent",
+        "agents.linear_agent.linear_agent.LinearAgent",
+        "agents.random_agent.random_agent.RandomAgent",
+        "agents.template_agent.template_agent.TemplateAgent",
+    ],
+    "domains": sorted(glob("domains/domain[0-9][0-9]")),
+    "deadline_rounds": [50, 200, 1000],
+    "repeats": 3,
+    "seed": 0,
+}
+
+# cells that are this much slower than the baseline are reported as a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def benchmark_cell(agent: str, domain: str, deadline_rounds: int, repeats: int, seed: int = 0) -> dict:
+    settings = {
+        "agents": [agent, agent],
+        "profiles": [f"{domain}/profileA.json", f"{domain}/profileB.json"],
+        "deadline_rounds": deadline_rounds,
+        "seed": seed,
+    }
+
+    wall_times, cpu_times, round_latencies = [], [], []
+    for _ in range(repeats):
+        # the timing of the instrumentation would be part of the wall time
+        start = time.perf_counter()
+        run_session(settings)
+        wall_times.append(time.perf_counter() - start)
+
+        results_trace, results_summary = run_session({**settings, "instrument": True})
+        cpu_times.append(session_cpu_time(results_summary))
+
+        # every round consists of an action of both agents
+        durations = [action.get("duration") or 0.0 for action in results_trace["actions"]]
+        round_latencies.extend(
+            sum(durations[i:i + 2]) for i in range(0, len(durations), 2)
+        )
+
+    # memory tracing slows down the session, so the peak memory gets its own run
+    tracemalloc.start()
+    run_session(settings)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "agent": agent.split(".")[-1],
+        "domain": os.path.basename(domain),
+        "deadline_rounds": deadline_rounds,
+        "result": results_summary["result"],
+        "num_offers": results_summary.get("num_offers", 0),
+        "wall_time_s": float(np.median(wall_times)),
+        "round_latency_ms_p50": float(np.percentile(round_latencies or [0.0], 50) * 1000),
+        "round_latency_ms_p95": float(np.percentile(round_latencies or [0.0], 95) * 1000),
+        "cpu_time_s": float(np.median(cpu_times)),
+        "peak_memory_mb": peak_memory / 2 ** 20,
+    }
+
+
+def session_cpu_time(results_summary: dict) -> float:
+    """CPU time both agents of an instrumented session spent on their calls."""
+    # the agents are numbered by their position in the session (see utils.session_runner.summarize_trace)
+    missing = [key for key in ("cpu_time_1", "cpu_time_2") if key not in results_summary]
+    if missing:
+        raise KeyError(f"{', '.join(missing)} missing from the session summary {results_summary}")
+    return results_summary["cpu_time_1"] + results_summary["cpu_time_2"]
+
+
+def run_benchmark(benchmark_settings: dict) -> dict:
+    cells = []
+    for agent in benchmark_settings["agents"]:
+        for domain in benchmark_settings["domains"]:
+            for deadline_rounds in benchmark_settings["deadline_rounds"]:
+                cell = benchmark_cell(
+                    agent, domain, deadline_rounds, benchmark_settings["repeats"], benchmark_settings["seed"]
+                )
+                print(
+                    f"{cell['agent']:>16} {cell['domain']:>9} {deadline_rounds:>6} rounds: "
+                    f"{cell['wall_time_s']:8.3f}s, p50 {cell['round_latency_ms_p50']:8.3f}ms/round, "
+                    f"peak {cell['peak_memory_mb']:8.2f}MB"
+                )
+                cells.append(cell)
+
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "settings": benchmark_settings,
+        },
+        "cells": cells,
+    }
+
+
+def compare_benchmarks(benchmark: dict, baseline: dict) -> list:
+    """Prints the relative change per cell compared to a baseline and returns the regressions."""
+    def key(cell):
+        return cell["agent"], cell["domain"], cell["deadline_rounds"]
+
+    baseline_cells = {key(cell): cell for cell in baseline["cells"]}
+    regressions = []
+    for cell in benchmark["cells"]:
+        base = baseline_cells.get(key(cell))
+        if base is None:
+            continue
+        ratio = cell["wall_time_s"] / base["wall_time_s"]
+        cpu_ratio = cell["cpu_time_s"] / base["cpu_time_s"] if base.get("cpu_time_s") else float("nan")
+        memory_ratio = cell["peak_memory_mb"] / max(base["peak_memory_mb"], 1e-9)
+        flag = ""
+        if ratio > 1 + REGRESSION_TOLERANCE or cpu_ratio > 1 + REGRESSION_TOLERANCE:
+            flag = "  <-- REGRESSION"
+            regressions.append(cell)
+        print(
+            f"{cell['agent']:>16} {cell['domain']:>9} {cell['deadline_rounds']:>6} rounds: "
+            f"time x{ratio:5.2f}, cpu x{cpu_ratio:5.2f}, memory x{memory_ratio:5.2f}{flag}"
+        )
+
+    return regressions
+
+
+# the main guard allows importing the benchmark functions without running them
+if __name__ == "__main__":
+    # compare against an earlier run by passing its file: python benchmark.py results/benchmarks/<file>.json
+    baseline_file = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if not os.path.exists(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+
+    benchmark = run_benchmark(benchmark_settings)
+
+    benchmark_file = f"{RESULTS_DIR}/benchmark_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(benchmark_file, "w") as f:
+        f.write(json.dumps(benchmark, indent=2))
+    print(f"Benchmark written to {benchmark_file}")
+
+    if baseline_file is not None:
+        with open(baseline_file, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_benchmarks(benchmark, baseline)
+        print(f"{len(regressions)} of {len(benchmark['cells'])} cells regressed more than {REGRESSION_TOLERANCE:.0%}")
+        if regressions:
+            sys.exit(1)
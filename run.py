@@ -3,7 +3,7 @@ import os
 import time
 
 from utils.plot_trace import plot_trace
-from utils.runners import run_session
+from utils.session_runner import run_session
 
 RESULTS_DIR = f"results/{time.strftime('%Y%m%d-%H%M%S')}"
 
@@ -15,6 +15,9 @@ if not os.path.exists(RESULTS_DIR):
 #   We need to specify the classpath of 2 agents to start a negotiation.
 #   We need to specify the preference profiles for both agents. The first profile will be assigned to the first agent.
 #   We need to specify a deadline of amount of rounds we can negotiate before we end without agreement
+#   Instead of (or next to) rounds, a deadline in time can be given as "deadline_time_ms"
+#   With "engine": "local", the time of the agents can be limited by "turn_timeout_ms", "time_budget_ms"
+#   and "cpu_budget_ms", an agent that exceeds a limit ends the session as a "timeout"
 settings = {
     "agents": [
         "agents.random_agent.random_agent.RandomAgent",
@@ -25,13 +28,13 @@ settings = {
 }
 
 # run a session and obtain results in dictionaries
+#   the trace is written to a compact trace file, that can be read back with utils.trace_io.read_trace
+settings["trace_file"] = f"{RESULTS_DIR}/results_trace.jsonl"
 results_trace, results_summary = run_session(settings)
 
 # plot trace to html file
 plot_trace(results_trace, f"{RESULTS_DIR}/trace_plot.html")
 
 # write results to file
-with open(f"{RESULTS_DIR}/results_trace.json", "w") as f:
-    f.write(json.dumps(results_trace, indent=2))
 with open(f"{RESULTS_DIR}/results_summary.json", "w") as f:
     f.write(json.dumps(results_summary, indent=2))
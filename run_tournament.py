@@ -1,19 +1,24 @@
 import json
 import os
+import sys
 import time
 
+from utils.plot_tournament import plot_tournament
+from utils.results_store import ResultsTable, format_leaderboard
 from utils.runners import run_tournament
 
-RESULTS_DIR = f"results/{time.strftime('%Y%m%d-%H%M%S')}"
-
-# create results directory if it does not exist
-if not os.path.exists(RESULTS_DIR):
-    os.makedirs(RESULTS_DIR)
+# an interrupted tournament can be resumed by passing its results directory: python run_tournament.py results/<timestamp>
+RESULTS_DIR = sys.argv[1] if len(sys.argv) > 1 else f"results/{time.strftime('%Y%m%d-%H%M%S')}"
 
 # Settings to run a tournament:
 #   We need to specify the classpath all agents that will participate in the tournament
 #   We need to specify duos of preference profiles that will be played by the agents
 #   We need to specify a deadline of amount of rounds we can negotiate before we end without agreement
+#   Instead of (or next to) rounds, a deadline in time can be given as "deadline_time_ms"
+#   With "engine": "local", the time of the agents can be limited by "turn_timeout_ms", "time_budget_ms"
+#   and "cpu_budget_ms", an agent that exceeds a limit ends the session as a "timeout"
+#   Parameters of agents can be given by their classpath in "parameters", e.g. a thinking delay in seconds of
+#   the time dependent agents: {"agents.boulware_agent.boulware_agent.BoulwareAgent": {"delay": 1.0}}
 tournament_settings = {
     "agents": [
         "agents.boulware_agent.boulware_agent.BoulwareAgent",
@@ -31,12 +36,38 @@ tournament_settings = {
     "deadline_rounds": 200,
 }
 
-# run a session and obtain results in dictionaries
-tournament, results_summaries = run_tournament(tournament_settings)
+# the main guard is required as worker processes import this script when running with multiple workers
+if __name__ == "__main__":
+    # create results directory if it does not exist
+    if not os.path.exists(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+
+    # run a session and obtain results in dictionaries
+    #   sessions can be spread over multiple processes by increasing the number of workers (e.g. os.cpu_count())
+    #   every finished session is appended to the checkpoint file, so no results are lost on a crash
+    #   the log messages of every session are written to a file in the logs directory instead of the terminal
+    #   the trace of every session is written to the traces directory (read them with utils.trace_io.iter_traces)
+    #   agents that simulate thinking delays can be run interleaved by passing max_concurrent (e.g. 100),
+    #   which does not support time limits of the agents
+    #   to rerun the tournament on warm workers after editing an agent, use: python -m utils.worker_pool
+    tournament, results_summaries = run_tournament(
+        tournament_settings,
+        workers=1,
+        checkpoint_file=f"{RESULTS_DIR}/checkpoint.jsonl",
+        log_dir=f"{RESULTS_DIR}/logs",
+        trace_dir=f"{RESULTS_DIR}/traces",
+    )
+
+    # save the tournament settings for reference
+    with open(f"{RESULTS_DIR}/tournament.json", "w") as f:
+        f.write(json.dumps(tournament, indent=2))
+    # save the result summaries
+    with open(f"{RESULTS_DIR}/results_summaries.json", "w") as f:
+        f.write(json.dumps(results_summaries, indent=2))
+    # save the result summaries as a columnar table (see utils.results_store) and print the leaderboard
+    results_table = ResultsTable.fromSummaries(tournament, results_summaries)
+    results_table.save(f"{RESULTS_DIR}/results_table.npz")
+    print(format_leaderboard(results_table.leaderboard()))
 
-# save the tournament settings for reference
-with open(f"{RESULTS_DIR}/tournament.json", "w") as f:
-    f.write(json.dumps(tournament, indent=2))
-# save the result summaries
-with open(f"{RESULTS_DIR}/results_summaries.json", "w") as f:
-    f.write(json.dumps(results_summaries, indent=2))
+    # plot agent-vs-agent heatmaps of the tournament to an html file
+    plot_tournament(results_table, f"{RESULTS_DIR}/tournament_plot.html")
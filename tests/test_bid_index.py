@@ -0,0 +1,125 @@
+import json
+import os
+import unittest
+from decimal import Decimal
+from glob import glob
+from itertools import product
+
+import numpy as np
+
+from utils.bid_index import MISSING, BidIndex, read_profile
+from utils.utility_tables import UtilityTables
+
+try:
+    import geniusweb  # noqa: F401
+except ImportError:
+    geniusweb = None
+
+DOMAINS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains")
+
+
+def domain_profiles(domain_dir: str):
+    return sorted(glob(os.path.join(domain_dir, "*profile*.json")))
+
+
+def decimal_utility(profile: dict, bid: dict) -> float:
+    """Utility of a (partial) bid as geniusweb computes it: a Decimal sum converted to float."""
+    total = Decimal(0)
+    for issue, value in bid.items():
+        value_utilities = profile["issueUtilities"][issue]["DiscreteValueSetUtilities"]["valueUtilities"]
+        total += profile["issueWeights"][issue] * value_utilities.get(value, Decimal(0))
+    return float(total)
+
+
+class TestBidIndex(unittest.TestCase):
+    """The fixed point utilities of the bid index are the exact Decimal utilities of geniusweb."""
+
+    def test_utilities_of_all_bids(self):
+        for domain_dir in sorted(glob(os.path.join(DOMAINS_DIR, "*"))):
+            profiles = domain_profiles(domain_dir)
+            index = BidIndex.fromProfiles(profiles)
+            for profile in profiles:
+                with self.subTest(profile=os.path.relpath(profile, DOMAINS_DIR)):
+                    parsed = read_profile(profile)
+                    expected = [decimal_utility(parsed, index.decode(i)) for i in range(index.size())]
+                    self.assertEqual(expected, index.getUtilities(profile).tolist())
+
+    def test_decimal_fallback(self):
+        # profile B of the jobs domain has utilities like 0.363636363636363636, which do
+        # not fit in int64, profile A is summed in fixed point
+        profile_a, profile_b = domain_profiles(os.path.join(DOMAINS_DIR, "jobs"))
+        index = BidIndex.fromProfiles([profile_a, profile_b])
+        self.assertEqual(np.int64, index.getTables(profile_a).getTables()[0].dtype)
+        self.assertEqual(object, index.getTables(profile_b).getTables()[0].dtype)
+
+    def test_tables_overflow(self):
+        # 25 decimals are beyond the scales of float64, a sum beyond 2^53 is not exact in int64
+        for tables in (
+            [[Decimal("0.1234567890123456789012345"), Decimal("0.5")], [Decimal("0.25"), Decimal("0")]],
+            [[Decimal(2 ** 52), Decimal("0.5")], [Decimal(2 ** 52), Decimal("1")]],
+        ):
+            utility_tables = UtilityTables(tables)
+            self.assertEqual(object, utility_tables.getTables()[0].dtype)
+            encoded = np.array(list(product(range(2), range(2))), dtype=np.int64)
+            expected = [float(tables[0][i] + tables[1][j]) for i, j in encoded.tolist()]
+            self.assertEqual(expected, utility_tables.getUtilities(encoded).tolist())
+            self.assertEqual(expected, utility_tables.getAllUtilities([2, 2]).tolist())
+
+    def test_encode_decode(self):
+        profiles = domain_profiles(os.path.join(DOMAINS_DIR, "domain00"))
+        index = BidIndex.fromProfiles(profiles)
+        bids = index.getBids()
+        for number in range(0, index.size(), 97):
+            bid = index.decode(number)
+            self.assertEqual(number, index.encode(bid))
+            self.assertEqual(bids[number].tolist(), index.encodeValues([bid])[0].tolist())
+            self.assertEqual(bid, index.decodeValues(index.encodeValues([bid])[0]))
+
+    def test_missing_values(self):
+        profiles = domain_profiles(os.path.join(DOMAINS_DIR, "domain00"))
+        index = BidIndex.fromProfiles(profiles)
+        parsed = read_profile(profiles[0])
+        complete = index.decode(1234)
+        first, second = index.getIssues()[:2]
+        partial = {issue: value for issue, value in complete.items() if issue != first}
+        unknown = {**complete, second: "unknownValue"}
+
+        encoded = index.encodeValues([partial, unknown])
+        self.assertEqual(MISSING, encoded[0, 0])
+        self.assertEqual(MISSING, encoded[1, 1])
+        # missing issues are left out of the decoded bid
+        self.assertEqual(partial, index.decodeValues(encoded[0]))
+        # and count as utility 0, like an unknown value
+        without_second = {issue: value for issue, value in complete.items() if issue != second}
+        self.assertEqual(
+            [decimal_utility(parsed, partial), decimal_utility(parsed, without_second)],
+            index.getUtilitiesEncoded(profiles[0], encoded).tolist(),
+        )
+
+
+@unittest.skipIf(geniusweb is None, "the evaluator scores geniusweb profiles (see requirements.txt)")
+class TestUtilityEvaluator(unittest.TestCase):
+    """The float64 evaluator of the agents returns exactly float(profile.getUtility(bid))."""
+
+    def test_utilities_of_all_bids(self):
+        from geniusweb.profile.Profile import Profile
+        from pyson.ObjectMapper import ObjectMapper
+
+        from utils.utility_evaluator import UtilityEvaluator
+
+        for domain_dir in sorted(glob(os.path.join(DOMAINS_DIR, "*"))):
+            for path in domain_profiles(domain_dir):
+                with self.subTest(profile=os.path.relpath(path, DOMAINS_DIR)):
+                    with open(path, "r") as f:
+                        profile = ObjectMapper().parse(json.load(f), Profile)
+                    evaluator = UtilityEvaluator(profile)
+                    utilities = evaluator.getAllUtilities()
+                    for number in range(evaluator.size()):
+                        bid = evaluator.decode(number)
+                        expected = float(profile.getUtility(bid))
+                        self.assertEqual(expected, utilities[number])
+                        self.assertEqual(expected, evaluator.getUtility(bid))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+from utils.checkpoint import (CheckpointWriter, finished_sessions,
+                              latest_summaries, read_checkpoint, session_key)
+
+SETTINGS = {
+    "agents": ["agents.random_agent.random_agent.RandomAgent", "agents.template_agent.template_agent.TemplateAgent"],
+    "profiles": ["domains/domain00/profileA.json", "domains/domain00/profileB.json"],
+    "deadline_rounds": 200,
+}
+OTHER_SETTINGS = {**SETTINGS, "profiles": ["domains/domain01/profileA.json", "domains/domain01/profileB.json"]}
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Resuming a tournament from a checkpoint file that may have been cut off by a crash."""
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.checkpoint_file = os.path.join(self._dir.name, "checkpoint.jsonl")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_truncated_last_line(self):
+        with CheckpointWriter(self.checkpoint_file) as checkpoint:
+            checkpoint.write(SETTINGS, {"result": "agreement"})
+        # the process got killed halfway through writing the next record
+        record = json.dumps({"settings": OTHER_SETTINGS, "results_summary": {"result": "agreement"}})
+        with open(self.checkpoint_file, "a") as f:
+            f.write(record[: len(record) // 2])
+
+        self.assertEqual([(SETTINGS, {"result": "agreement"})], list(read_checkpoint(self.checkpoint_file)))
+        self.assertEqual({session_key(SETTINGS)}, finished_sessions(self.checkpoint_file))
+
+        # a resumed run starts on a new line, after which the partial line is still skipped
+        with CheckpointWriter(self.checkpoint_file) as checkpoint:
+            checkpoint.write(OTHER_SETTINGS, {"result": "failed"})
+        self.assertEqual(
+            [(SETTINGS, {"result": "agreement"}), (OTHER_SETTINGS, {"result": "failed"})],
+            list(read_checkpoint(self.checkpoint_file)),
+        )
+
+    def test_error_sessions_run_again(self):
+        with CheckpointWriter(self.checkpoint_file) as checkpoint:
+            checkpoint.write(SETTINGS, {"result": "agreement"})
+            checkpoint.write(OTHER_SETTINGS, {"result": "ERROR"})
+        self.assertEqual({session_key(SETTINGS)}, finished_sessions(self.checkpoint_file))
+
+    def test_latest_record_wins(self):
+        with CheckpointWriter(self.checkpoint_file) as checkpoint:
+            checkpoint.write(SETTINGS, {"result": "ERROR"})
+            checkpoint.write(OTHER_SETTINGS, {"result": "failed"})
+        with CheckpointWriter(self.checkpoint_file) as checkpoint:
+            checkpoint.write(SETTINGS, {"result": "agreement"})
+
+        self.assertEqual(
+            {session_key(SETTINGS): {"result": "agreement"}, session_key(OTHER_SETTINGS): {"result": "failed"}},
+            latest_summaries(self.checkpoint_file),
+        )
+        self.assertEqual({session_key(SETTINGS), session_key(OTHER_SETTINGS)}, finished_sessions(self.checkpoint_file))
+
+    def test_missing_file(self):
+        self.assertEqual(set(), finished_sessions(self.checkpoint_file))
+
+    def test_session_key_ignores_key_order(self):
+        reordered = {key: SETTINGS[key] for key in reversed(list(SETTINGS))}
+        self.assertNotEqual(json.dumps(SETTINGS), json.dumps(reordered))
+        self.assertEqual(session_key(SETTINGS), session_key(reordered))
+        # the order of the agents and profiles does matter
+        swapped = {**SETTINGS, "agents": SETTINGS["agents"][::-1]}
+        self.assertNotEqual(session_key(SETTINGS), session_key(swapped))
+
+
+if __name__ == "__main__":
+    unittest.main()
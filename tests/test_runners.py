@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+try:
+    import geniusweb  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest("the sessions are run by geniusweb (see requirements.txt)")
+
+from utils.bid_index import get_bid_index
+from utils.results_store import ResultsTable
+from utils.saop_engine import TurnTimeout
+from utils.session_runner import (run_session, session_partyprofiles,
+                                  session_timeout_results)
+from utils.trace_io import TraceWriter, read_trace
+
+DOMAIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains", "domain00")
+PROFILES = [os.path.join(DOMAIN_DIR, "profileA.json"), os.path.join(DOMAIN_DIR, "profileB.json")]
+
+
+class TestRunners(unittest.TestCase):
+    def setUp(self):
+        self._log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._log_dir.cleanup()
+
+    def test_summaries_by_position(self):
+        # geniusweb numbers the parties over all sessions of the process
+        tournament = [
+            {
+                "agents": [
+                    "agents.boulware_agent.boulware_agent.BoulwareAgent",
+                    "agents.linear_agent.linear_agent.LinearAgent",
+                ],
+                "profiles": PROFILES,
+                "deadline_rounds": 20,
+                "seed": seed,
+                "log_file": os.path.join(self._log_dir.name, "session.log"),
+            }
+            for seed in (1, 2)
+        ]
+        results_summaries = [run_session(settings)[1] for settings in tournament]
+
+        for results_summary in results_summaries:
+            self.assertEqual("BoulwareAgent", results_summary["agent_1"])
+            self.assertEqual("LinearAgent", results_summary["agent_2"])
+        results_table = ResultsTable.fromSummaries(tournament, results_summaries)
+        self.assertEqual(2, results_table.size())
+        self.assertEqual(["BoulwareAgent", "LinearAgent"], results_table.getAgents())
+
+    def test_timeout_keeps_streamed_actions(self):
+        agents = ["agents.random_agent.random_agent.RandomAgent"] * 2
+        partyprofiles = session_partyprofiles(agents, [f"file:{x}" for x in PROFILES])
+        index = get_bid_index(PROFILES)
+        error = TurnTimeout("session did not finish within 1000 ms")
+        for streamed in (True, False):
+            with self.subTest(streamed=streamed):
+                trace_file = os.path.join(self._log_dir.name, f"session_{streamed}.jsonl.gz")
+                settings = {"agents": agents, "profiles": PROFILES, "seed": 7, "trace_file": trace_file}
+                actions = []
+                if streamed:
+                    # the trace file of a session that was killed after two offers
+                    writer = TraceWriter(trace_file, partyprofiles, seed=7)
+                    for number, party in enumerate(partyprofiles):
+                        actions.append({
+                            "action": "Offer",
+                            "actor": party,
+                            "bid": index.decode(number),
+                            "utilities": {p: float(index.getUtilities(x)[number]) for p, x in zip(partyprofiles, PROFILES)},
+                        })
+                        writer.write(actions[-1])
+
+                results_trace, results_summary = session_timeout_results(settings, error)
+
+                self.assertEqual(actions, results_trace["actions"])
+                self.assertEqual(repr(error), results_trace["error"])
+                self.assertEqual("timeout", results_summary["result"])
+                self.assertEqual(7, results_summary["seed"])
+                self.assertEqual((results_trace, results_summary), read_trace(trace_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
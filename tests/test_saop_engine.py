@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from itertools import product
+
+try:
+    import geniusweb  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest("the sessions are run by geniusweb (see requirements.txt)")
+
+from utils.session_runner import run_session
+from utils.saop_engine import compare_traces
+
+DOMAIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains", "domain00")
+
+# only agents that behave deterministically (given their seed) can be compared
+AGENTS = [
+    "agents.boulware_agent.boulware_agent.BoulwareAgent",
+    "agents.conceder_agent.conceder_agent.ConcederAgent",
+    "agents.hardliner_agent.hardliner_agent.HardlinerAgent",
+    "agents.linear_agent.linear_agent.LinearAgent",
+]
+
+
+class TestSAOPEngine(unittest.TestCase):
+    """The local engine (utils.saop_engine) negotiates exactly like geniusweb's NegoRunner."""
+
+    def setUp(self):
+        self._log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._log_dir.cleanup()
+
+    def test_same_trace_as_geniusweb(self):
+        for agent_1, agent_2 in product(AGENTS, AGENTS):
+            with self.subTest(agent_1=agent_1.split(".")[-1], agent_2=agent_2.split(".")[-1]):
+                settings = {
+                    "agents": [agent_1, agent_2],
+                    "profiles": [
+                        os.path.join(DOMAIN_DIR, "profileA.json"),
+                        os.path.join(DOMAIN_DIR, "profileB.json"),
+                    ],
+                    "deadline_rounds": 50,
+                    # both engines pass the same seeds to the agents
+                    "seed": 42,
+                    "log_file": os.path.join(self._log_dir.name, "session.log"),
+                }
+                trace_geniusweb, summary_geniusweb = run_session(settings)
+                trace_local, summary_local = run_session({**settings, "engine": "local"})
+
+                self.assertIsNone(trace_geniusweb["error"])
+                self.assertIsNone(trace_local["error"])
+                self.assertEqual([], compare_traces(trace_geniusweb, trace_local))
+                self.assertEqual(summary_geniusweb["result"], summary_local["result"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import unittest
+from glob import glob
+from math import hypot
+from random import Random
+
+import numpy as np
+
+from utils.bid_index import BidIndex
+from utils.specials import (ParetoIndex, compute_specials, get_pareto_index,
+                            pareto_front_indices)
+
+DOMAINS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains")
+DOMAIN_DIR = os.path.join(DOMAINS_DIR, "domain00")
+PROFILES = [os.path.join(DOMAIN_DIR, "profileA.json"), os.path.join(DOMAIN_DIR, "profileB.json")]
+
+
+def front_utilities(specials: dict) -> list:
+    return [p["utility"] for p in specials["pareto_front"]]
+
+
+class TestSpecials(unittest.TestCase):
+    """The Pareto front, Nash and Kalai points and the distances to them, compared to brute force."""
+
+    def test_pareto_front_indices(self):
+        index = BidIndex.fromProfiles(PROFILES)
+        utils_1, utils_2 = (index.getUtilities(p) for p in PROFILES)
+
+        # a bid is Pareto optimal if no other bid is at least as good for both and better for one
+        optimal = set()
+        for u_1, u_2 in zip(utils_1.tolist(), utils_2.tolist()):
+            dominated = np.any((utils_1 >= u_1) & (utils_2 >= u_2) & ((utils_1 > u_1) | (utils_2 > u_2)))
+            if not dominated:
+                optimal.add((u_1, u_2))
+
+        front = pareto_front_indices(utils_1, utils_2)
+        points = list(zip(utils_1[front].tolist(), utils_2[front].tolist()))
+        # one bid per optimal point, sorted by the utility of the first profile
+        self.assertEqual(sorted(optimal), points)
+
+    def test_issuewise_equals_enumerated(self):
+        for domain_dir in sorted(glob(os.path.join(DOMAINS_DIR, "*"))):
+            profiles = sorted(glob(os.path.join(domain_dir, "*profile*.json")))
+            with self.subTest(domain=os.path.basename(domain_dir)):
+                enumerated = compute_specials(profiles, max_enumerate=10 ** 6)
+                issuewise = compute_specials(profiles, max_enumerate=0)
+                self.assertEqual(front_utilities(enumerated), front_utilities(issuewise))
+                self.assertEqual(enumerated["nash"]["utility"], issuewise["nash"]["utility"])
+                self.assertEqual(enumerated["kalai"]["utility"], issuewise["kalai"]["utility"])
+
+    def test_bundled_specials(self):
+        # the bundled specials were summed in float, the computed ones are exact
+        for specials_file in sorted(glob(os.path.join(DOMAINS_DIR, "*", "specials.json"))):
+            domain_dir = os.path.dirname(specials_file)
+            profiles = sorted(glob(os.path.join(domain_dir, "*profile*.json")))
+            with self.subTest(domain=os.path.basename(domain_dir)):
+                with open(specials_file, "r") as f:
+                    bundled = json.load(f)
+                computed = compute_specials(profiles, max_enumerate=0)
+
+                np.testing.assert_allclose(front_utilities(bundled), front_utilities(computed), atol=1e-9)
+                for special in ("nash", "kalai"):
+                    self.assertEqual(bundled[special]["bid"], computed[special]["bid"])
+                    np.testing.assert_allclose(
+                        bundled[special]["utility"], computed[special]["utility"], atol=1e-9
+                    )
+
+    def test_distances(self):
+        with open(os.path.join(DOMAIN_DIR, "specials.json"), "r") as f:
+            specials = json.load(f)
+        front = front_utilities(specials)
+        pareto_index = get_pareto_index(PROFILES)
+        self.assertIsInstance(pareto_index, ParetoIndex)
+
+        rng = Random(0)
+        # outcomes all over the unit square, on the frontier and beyond its ends
+        outcomes = [(rng.random(), rng.random()) for _ in range(500)] + front + [(0.0, 1.0), (1.0, 0.0)]
+        for util_1, util_2 in outcomes:
+            expected = min(hypot(u_1 - util_1, u_2 - util_2) for u_1, u_2 in front)
+            self.assertAlmostEqual(expected, pareto_index.getParetoDistance(util_1, util_2), places=12)
+
+        nash = specials["nash"]["utility"]
+        kalai = specials["kalai"]["utility"]
+        self.assertAlmostEqual(hypot(nash[0] - 0.5, nash[1] - 0.25), pareto_index.getNashDistance(0.5, 0.25))
+        self.assertAlmostEqual(hypot(kalai[0] - 0.5, kalai[1] - 0.25), pareto_index.getKalaiDistance(0.5, 0.25))
+        self.assertEqual(0.0, pareto_index.getNashDistance(*nash))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from utils.bid_index import get_bid_index
+from utils.trace_io import INCOMPLETE_ERROR, TraceWriter, read_trace
+
+DOMAIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "domains", "domain00")
+PROFILES = [os.path.join(DOMAIN_DIR, "profileA.json"), os.path.join(DOMAIN_DIR, "profileB.json")]
+PARTYPROFILES = {
+    "party_1": {"party": "agents.random_agent.random_agent.RandomAgent", "profile": "file:" + PROFILES[0]},
+    "party_2": {"party": "agents.random_agent.random_agent.RandomAgent", "profile": "file:" + PROFILES[1]},
+}
+
+
+def action_records(count: int) -> list:
+    index = get_bid_index(PROFILES)
+    records = []
+    for number in range(count):
+        bid = index.decode(number * 31)
+        records.append({
+            "action": "Offer",
+            "actor": "party_1" if number % 2 == 0 else "party_2",
+            "bid": bid,
+            "utilities": {"party_1": float(index.getUtilities(PROFILES[0])[number * 31]),
+                          "party_2": float(index.getUtilities(PROFILES[1])[number * 31])},
+        })
+    return records
+
+
+class TestTraceWriter(unittest.TestCase):
+    """Streamed trace files can be read while they are written."""
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_read_while_writing(self):
+        records = action_records(5)
+        for extension in (".jsonl", ".jsonl.gz"):
+            with self.subTest(extension=extension):
+                path = os.path.join(self._dir.name, "session" + extension)
+                writer = TraceWriter(path, PARTYPROFILES, seed=3)
+
+                # only the header has been written
+                results_trace, summary = read_trace(path)
+                self.assertEqual([], results_trace["actions"])
+                self.assertEqual(INCOMPLETE_ERROR, results_trace["error"])
+                self.assertEqual(3, results_trace["seed"])
+
+                for number, record in enumerate(records):
+                    writer.write(record)
+                    results_trace, summary = read_trace(path)
+                    self.assertEqual(records[: number + 1], results_trace["actions"])
+                    self.assertEqual(INCOMPLETE_ERROR, results_trace["error"])
+                    self.assertIsNone(summary)
+
+                writer.close(None, {"result": "failed"})
+                results_trace, summary = read_trace(path)
+                self.assertEqual(records, results_trace["actions"])
+                self.assertIsNone(results_trace["error"])
+                self.assertEqual({"result": "failed"}, summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Manager
+from random import Random
+from typing import Iterator, List, Tuple
+
+from utils.buffered_reporter import BufferedReporter
+from utils.saop_engine import SAOPEngine
+from utils.session_runner import (SESSION_LIMITS, session_deadline,
+                                  session_error_summary, session_recorder,
+                                  session_results, session_seeds)
+from utils.std_out_reporter import StdOutReporter
+from utils.warm_up import sessions_warm_up, warm_up, warm_up_worker
+from utils.worker_pool import WorkerPool
+
+
+async def run_session_async(settings: dict) -> Tuple[dict, dict]:
+    """Runs a session with the in-process engine (see `utils.saop_engine`) as a coroutine.
+
+    The "delay" parameter of the agents (see `TimeDependentAgent`) is not passed to
+    the agents. Instead the runner waits a random time in [0.5 * delay, 1.5 * delay]
+    seconds before every turn of such an agent, during which other sessions continue.
+
+    Accepts the same settings as `utils.session_runner.run_session`, except for "instrument",
+    "legacy_trace", the time limits of the agents and "engine" (always the in-process
+    engine).
+    """
+    if settings.get("instrument", False) or settings.get("legacy_trace", False):
+        raise ValueError("instrumented sessions and legacy traces are not supported by the asyncio runner")
+    if any(settings.get(key, None) is not None for key in SESSION_LIMITS):
+        # an agent that exceeds its limits can only be stopped with the process of its
+        # session (see utils.session_runner.run_isolated_session), which the interleaved sessions share
+        raise ValueError("time limits of the agents are not supported by the asyncio runner")
+    agents = settings["agents"]
+    profiles = settings["profiles"]
+    rounds, durationms = session_deadline(settings)
+    seed, parameters = session_seeds(settings)
+    # the delays are drawn from the seed of the session as well
+    rng = Random(seed)
+    log_file = settings.get("log_file", None)
+    trace_file = settings.get("trace_file", None)
+
+    # the agents do not sleep themselves, the delays are awaited between the turns
+    delays = [float(p.pop("delay", 0)) for p in parameters]
+
+    if log_file is None:
+        reporter = StdOutReporter()
+    else:
+        reporter = BufferedReporter(log_file, level=settings.get("log_level", logging.INFO))
+    profiles_uri = [f"file:{x}" for x in profiles]
+    recorder = None
+    if trace_file is not None:
+        recorder = session_recorder(trace_file, agents, profiles_uri, seed)
+    try:
+        engine = SAOPEngine(
+            agents, profiles_uri, parameters, rounds, durationms, reporter, listener=recorder
+        )
+        engine.start()
+        while not engine.isFinished():
+            delay = delays[engine.getTurn()]
+            if delay > 0:
+                await asyncio.sleep(delay * (0.5 + rng.random()))
+                # the deadline may have passed during the delay
+                if engine.isFinished():
+                    break
+            engine.step()
+            # let the other sessions have a turn
+            await asyncio.sleep(0)
+        engine.finish()
+    finally:
+        if log_file is not None:
+            reporter.close()
+
+    return session_results(engine.getState(), trace_file=trace_file, seed=seed, recorder=recorder)
+
+
+def iter_sessions_loop(
+    sessions: List[dict], max_concurrent: int = 100
+) -> Iterator[Tuple[int, dict]]:
+    """Runs sessions interleaved in one asyncio event loop and yields (index, results_summary)
+    pairs as soon as a session finishes. At most `max_concurrent` sessions run at once.
+
+    The event loop runs in a separate thread, so that the caller can process the
+    summaries (e.g. write them to a checkpoint file) while the sessions continue.
+    """
+    finished = queue.Queue()
+    done = object()
+
+    async def run_limited(semaphore, index, settings):
+        async with semaphore:
+            try:
+                _, results_summary = await run_session_async(settings)
+            except Exception as e:
+                results_summary = session_error_summary(settings, e)
+        finished.put((index, results_summary))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(max_concurrent)
+        await asyncio.gather(
+            *(run_limited(semaphore, index, settings) for index, settings in enumerate(sessions))
+        )
+
+    def run_loop():
+        try:
+            asyncio.run(run_all())
+        finally:
+            finished.put(done)
+
+    thread = threading.Thread(target=run_loop, daemon=True)
+    thread.start()
+    while True:
+        item = finished.get()
+        if item is done:
+            break
+        yield item
+    thread.join()
+
+
+def stream_sessions_async(
+    sessions: List[dict], indices: List[int], max_concurrent: int, finished
+) -> int:
+    """Runs sessions interleaved in one asyncio event loop and puts (index, results_summary)
+    pairs on `finished` as soon as a session finishes, the index of a session is taken
+    from `indices`. Used by worker processes with a (multiprocessing manager) queue, so
+    that the parent process gets the summaries while the sessions of the worker
+    continue. Returns the number of sessions.
+    """
+    for position, results_summary in iter_sessions_loop(sessions, max_concurrent):
+        finished.put((indices[position], results_summary))
+    return len(sessions)
+
+
+def run_sessions_async(sessions: List[dict], max_concurrent: int = 100) -> List[dict]:
+    """Runs sessions interleaved in one asyncio event loop and returns their summaries in order."""
+    results_summaries = [None] * len(sessions)
+    for index, results_summary in iter_sessions_loop(sessions, max_concurrent):
+        results_summaries[index] = results_summary
+    return results_summaries
+
+
+def iter_sessions_async(
+    sessions: List[dict], max_concurrent: int = 100, workers: int = 1
+) -> Iterator[Tuple[int, dict]]:
+    """Runs sessions interleaved in asyncio event loops, with at most `max_concurrent`
+    sessions at once per loop, and yields (index, results_summary) pairs as soon as
+    a session finishes. The agents and profiles are loaded before the first session
+    (see `utils.warm_up.warm_up`).
+
+    With a single worker the event loop runs in this process (see `iter_sessions_loop`),
+    otherwise every worker process runs an equal share of the sessions in its own loop.
+    """
+    if any(settings.get(key, None) is not None for settings in sessions for key in SESSION_LIMITS):
+        raise ValueError("time limits of the agents are not supported with max_concurrent")
+
+    agents, profile_sets = sessions_warm_up(sessions)
+    if workers <= 1:
+        warm_up(agents, profile_sets)
+        yield from iter_sessions_loop(sessions, max_concurrent)
+        return
+
+    # every worker puts every summary on a shared queue as soon as the session finishes
+    chunks = [list(range(w, len(sessions), workers)) for w in range(workers)]
+    # sessions that did not finish because the process pool broke
+    unfinished = []
+    with Manager() as manager, ProcessPoolExecutor(
+        max_workers=workers, initializer=warm_up_worker, initargs=(agents, profile_sets)
+    ) as executor:
+        finished = manager.Queue()
+        futures = {
+            executor.submit(
+                stream_sessions_async, [sessions[i] for i in chunk], chunk, max_concurrent, finished
+            ): chunk
+            for chunk in chunks
+            if chunk
+        }
+        pending = set(range(len(sessions)))
+
+        def drain() -> Iterator[Tuple[int, dict]]:
+            while True:
+                try:
+                    index, results_summary = finished.get_nowait()
+                except queue.Empty:
+                    return
+                if index in pending:
+                    pending.remove(index)
+                    yield index, results_summary
+
+        while pending:
+            try:
+                index, results_summary = finished.get(timeout=0.5)
+            except queue.Empty:
+                pass
+            else:
+                if index in pending:
+                    pending.remove(index)
+                    yield index, results_summary
+                continue
+
+            # the last summaries of a failed worker were put on the queue before it
+            # failed, they are taken first
+            failed = [f for f in futures if f.done() and f.exception() is not None]
+            if failed:
+                yield from drain()
+            if any(isinstance(f.exception(), BrokenProcessPool) for f in failed):
+                # a worker process that dies breaks the pool, which kills the other
+                # workers as well, so it is unknown which session crashed
+                unfinished = sorted(pending)
+                break
+            for future in failed:
+                for index in futures[future]:
+                    if index in pending:
+                        pending.remove(index)
+                        yield index, session_error_summary(sessions[index], future.exception())
+
+    if unfinished:
+        # every unfinished session runs again in its own child process (without the
+        # asyncio runner), only the session that crashed ends in an ERROR
+        with WorkerPool(workers, agents, profile_sets) as pool:
+            for position, results_summary in pool.run_sessions(
+                [sessions[i] for i in unfinished], isolated=True
+            ):
+                yield unfinished[position], results_summary
@@ -0,0 +1,190 @@
+import json
+import os
+from decimal import Decimal
+from functools import lru_cache
+from math import prod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.utility_tables import UtilityTables
+
+# value index of an issue that is missing from a (partial) bid, or has an unknown value
+MISSING = -1
+
+
+class BidIndex:
+    """
+    Integer encoding of the bids of a discrete domain, shared by everything in utils
+    that scores bids of a set of profiles: the traces of sessions, trace files, the
+    replay of traces and the specials.
+
+    A bid is encoded as a row of value indices over the issues (in sorted order),
+    with `MISSING` for issues that are missing from a partial bid. The utilities of
+    a matrix of encoded bids are computed per profile in a single batched operation
+    with the exact arithmetic of `UtilityTables`.
+
+    Complete bid i is the mixed-radix number i over the issues (first issue most
+    significant). The matrix of all bids and their float64 utilities is only
+    enumerated when it is needed (`getBids`, `getUtilities`), in memory. Use
+    `get_bid_index` for the (per process) cached index of a set of profiles.
+    """
+
+    def __init__(
+        self,
+        issues: List[str],
+        values: List[List[str]],
+        profiles: Sequence[str],
+    ):
+        self._issues = issues
+        self._values = values
+        self._profiles = [os.path.normpath(p) for p in profiles]
+        self._value_indices = [{v: i for i, v in enumerate(vs)} for vs in values]
+        # stride of every issue in the mixed-radix bid number
+        self._strides = np.array(
+            [prod(len(vs) for vs in values[i + 1:]) for i in range(len(values))],
+            dtype=np.int64,
+        )
+        self._bids: Optional[np.ndarray] = None
+        self._utilities: Dict[str, np.ndarray] = {}
+        self._tables: Dict[str, UtilityTables] = {}
+
+    @staticmethod
+    def fromProfiles(profiles: Sequence[str]) -> "BidIndex":
+        """Index of the domain of a set of profile files, without enumerating the bids."""
+        profiles = [os.path.normpath(p) for p in profiles]
+        issues, values = domain_issues_values([read_profile(p) for p in profiles], profiles)
+        return BidIndex(issues, values, profiles)
+
+    @staticmethod
+    def build(profiles: Sequence[str]) -> "BidIndex":
+        """Builds the index of the domain of a set of profile files in memory, with all
+        bids and their utilities enumerated."""
+        index = BidIndex.fromProfiles(profiles)
+        for profile in index.getProfiles():
+            index.getUtilities(profile)
+        return index
+
+    def size(self) -> int:
+        return int(prod(len(vs) for vs in self._values))
+
+    def getProfiles(self) -> List[str]:
+        return self._profiles
+
+    def getIssues(self) -> List[str]:
+        return self._issues
+
+    def getValues(self, issue: str) -> List[str]:
+        return self._values[self._issues.index(issue)]
+
+    def getBids(self) -> np.ndarray:
+        """(num_bids, num_issues) matrix of value indices, row i is bid i."""
+        if self._bids is None:
+            radices = [len(vs) for vs in self._values]
+            num_bids = self.size()
+            # every column repeats each value index for all combinations of the issues after it
+            dtype = np.uint8 if max(radices, default=0) <= 256 else np.uint16
+            bids = np.empty((num_bids, len(radices)), dtype=dtype)
+            for column, (radix, stride) in enumerate(zip(radices, self._strides.tolist())):
+                repeats = num_bids // (stride * radix)
+                bids[:, column] = np.tile(np.repeat(np.arange(radix, dtype=dtype), stride), repeats)
+            self._bids = bids
+        return self._bids
+
+    def getUtilities(self, profile: str) -> np.ndarray:
+        """Utilities of all bids for one of the indexed profile files."""
+        profile = os.path.normpath(profile)
+        if profile not in self._utilities:
+            self._utilities[profile] = self.getUtilitiesEncoded(profile, self.getBids())
+        return self._utilities[profile]
+
+    def getTables(self, profile: str) -> UtilityTables:
+        """Utility tables of one of the indexed profile files, the tables have an extra
+        zero entry at the end for `MISSING` values."""
+        profile = os.path.normpath(profile)
+        if profile not in self._profiles:
+            raise ValueError(f"Profile {profile} is not indexed")
+        if profile not in self._tables:
+            tables = decimal_tables(read_profile(profile), self._issues, self._values)
+            self._tables[profile] = UtilityTables([table + [Decimal(0)] for table in tables])
+        return self._tables[profile]
+
+    def getUtilitiesEncoded(self, profile: str, encoded: np.ndarray) -> np.ndarray:
+        """Utilities of a (num_bids, num_issues) matrix of value indices (see
+        `encodeValues`) for one of the indexed profile files."""
+        return self.getTables(profile).getUtilities(encoded)
+
+    def encodeValues(self, bids: Sequence[Dict[str, str]]) -> np.ndarray:
+        """Encodes bids given as issue -> value string as a (num_bids, num_issues) int64
+        matrix of value indices, with `MISSING` for missing and unknown values."""
+        encoded = np.empty((len(bids), len(self._issues)), dtype=np.int64)
+        for column, (issue, indices) in enumerate(zip(self._issues, self._value_indices)):
+            encoded[:, column] = [
+                indices.get(str(bid[issue]), MISSING) if issue in bid else MISSING
+                for bid in bids
+            ]
+        return encoded
+
+    def decodeValues(self, encoded: Sequence[int]) -> Dict[str, str]:
+        """Issue -> value string of a row of value indices, without the `MISSING` issues."""
+        return {
+            issue: values[i]
+            for issue, values, i in zip(self._issues, self._values, encoded)
+            if i != MISSING
+        }
+
+    def encode(self, issuevalues: Dict[str, str]) -> int:
+        """Bid number of a complete bid given as issue -> value string."""
+        digits = [
+            indices[str(issuevalues[issue])]
+            for issue, indices in zip(self._issues, self._value_indices)
+        ]
+        return int(np.dot(digits, self._strides))
+
+    def decode(self, index: int) -> Dict[str, str]:
+        """Issue -> value string of bid number `index`."""
+        return self.decodeValues(self.getBids()[index])
+
+
+def get_bid_index(profiles: Sequence[str]) -> BidIndex:
+    """Returns the (cached) in-memory `BidIndex` of the domain of a set of profile
+    files, to encode and score bids of these profiles."""
+    profiles = tuple(dict.fromkeys(os.path.normpath(p) for p in profiles))
+    return _get_bid_index(profiles, tuple(os.stat(p).st_mtime_ns for p in profiles))
+
+
+@lru_cache(maxsize=64)
+def _get_bid_index(profiles: Tuple[str, ...], _mtimes: Tuple[int, ...]) -> BidIndex:
+    return BidIndex.fromProfiles(profiles)
+
+
+def read_profile(path: str) -> dict:
+    """Reads a linear additive profile file with all numbers parsed as exact Decimals."""
+    with open(path, "r") as f:
+        profile = json.load(f, parse_float=Decimal, parse_int=Decimal)
+    return profile["LinearAdditiveUtilitySpace"]
+
+
+def domain_issues_values(parsed: List[dict], profiles: Sequence[str]) -> Tuple[List[str], List[List[str]]]:
+    """Sorted issues and their values of the domain shared by a set of parsed profiles."""
+    domain = parsed[0]["domain"]
+    for profile, path in zip(parsed[1:], profiles[1:]):
+        if profile["domain"] != domain:
+            raise ValueError(f"Profile {path} is defined over a different domain than {profiles[0]}")
+
+    issues = sorted(domain["issuesValues"].keys())
+    values = [[str(v) for v in domain["issuesValues"][i]["values"]] for i in issues]
+    return issues, values
+
+
+def decimal_tables(profile: dict, issues: List[str], values: List[List[str]]) -> List[List[Decimal]]:
+    """Weighted value utilities of a parsed profile, per issue in the order of `values`."""
+    weights = profile["issueWeights"]
+    tables = []
+    for issue, issue_values in zip(issues, values):
+        value_utilities = profile["issueUtilities"][issue]["DiscreteValueSetUtilities"]["valueUtilities"]
+        tables.append(
+            [weights[issue] * value_utilities.get(v, Decimal(0)) for v in issue_values]
+        )
+    return tables
+
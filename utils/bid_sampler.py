@@ -0,0 +1,73 @@
+import random
+from typing import Optional
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
+
+from utils.utility_evaluator import UtilityEvaluator
+
+
+class ThresholdBidSampler:
+    """
+    Draws uniformly random bids from the bids of a profile whose utility is at
+    or above a threshold, replacing rejection sampling over `AllBidsList`.
+
+    All bids are sorted by utility once per profile, so the acceptable bids are a
+    contiguous range: sampling a bid is O(1) and changing the threshold is a
+    bisection, without rebuilding anything. A bid is stored as its mixed-radix
+    number over the issues (see `UtilityEvaluator.getAllUtilities`) and only
+    turned into a `Bid` when it is sampled.
+    """
+
+    def __init__(
+        self,
+        profile: LinearAdditive,
+        threshold: float = 0.0,
+        strict: bool = False,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Args:
+            profile (LinearAdditive): the profile to sample bids of.
+            threshold (float, optional): minimum utility of sampled bids. Defaults to 0.0.
+            strict (bool, optional): require a utility above (instead of at least)
+                the threshold. Defaults to False.
+            rng (Optional[random.Random], optional): source of randomness. Defaults
+                to the global random module.
+        """
+        self._profile = profile
+        self._evaluator = UtilityEvaluator(profile)
+        utilities = self._evaluator.getAllUtilities()
+        self._numbers = np.argsort(utilities, kind="stable")
+        self._utilities = utilities[self._numbers]
+        self._rng = rng if rng is not None else random
+        self.setThreshold(threshold, strict)
+
+    def getProfile(self) -> LinearAdditive:
+        return self._profile
+
+    def setThreshold(self, threshold: float, strict: bool = False):
+        """Changes the minimum utility of sampled bids in O(log n)."""
+        self._threshold = threshold
+        side = "right" if strict else "left"
+        self._start = int(np.searchsorted(self._utilities, threshold, side=side))
+
+    def getThreshold(self) -> float:
+        return self._threshold
+
+    def size(self) -> int:
+        """Number of bids that satisfy the threshold."""
+        return len(self._numbers) - self._start
+
+    def sample(self) -> Bid:
+        """
+        Returns:
+            Bid: a uniformly random bid that satisfies the threshold, or a bid with
+                the maximum utility if no bid satisfies it.
+        """
+        if self.size() == 0:
+            # first of the bids with the maximum utility
+            start = int(np.searchsorted(self._utilities, self._utilities[-1], side="left"))
+            return self._evaluator.decode(self._numbers[start])
+        return self._evaluator.decode(self._numbers[self._rng.randint(self._start, len(self._numbers) - 1)])
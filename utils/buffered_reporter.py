@@ -0,0 +1,129 @@
+import logging
+import queue
+import sys
+import threading
+import traceback
+from typing import Optional
+
+from tudelft_utilities_logging.Reporter import Reporter
+
+# marks the end of the records in the queue
+_CLOSE = object()
+
+
+class BufferedReporter(Reporter):
+    """
+    Reporter that does not block the negotiation on writing its messages.
+
+    Messages below `level` are discarded right away, the others are put on a
+    bounded queue that a background thread drains in batches to a log file (or to
+    stdout/stderr like `StdOutReporter` if no file is given). Call `close` (or use
+    the reporter as a context manager) to write the remaining messages.
+
+    When the queue is full a message is either dropped and counted (the default)
+    or the caller waits until there is room again (`block=True`). Warnings and
+    errors are never dropped.
+    """
+
+    def __init__(
+        self,
+        log_file: str = None,
+        level: int = logging.INFO,
+        maxsize: int = 10000,
+        block: bool = False,
+        batch_size: int = 256,
+    ):
+        self._log_file = log_file
+        self._level = level
+        self._block = block
+        self._batch_size = batch_size
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def log(self, level: int, msg: str, exc: Optional[BaseException] = None):
+        if level < self._level or self._closed:
+            return
+
+        record = (level, msg, exc)
+        # warnings and errors are never dropped
+        if self._block or level >= logging.WARNING:
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def getLevel(self) -> int:
+        return self._level
+
+    def getDropped(self) -> int:
+        """Number of messages that were dropped because the queue was full."""
+        return self._dropped
+
+    def close(self):
+        """Writes the remaining messages and stops the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        # the end marker has to be delivered, even if the queue is full
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def __enter__(self) -> "BufferedReporter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _drain(self):
+        out = open(self._log_file, "w") if self._log_file is not None else None
+        try:
+            done = False
+            while not done:
+                # wait for a record, then take whatever else is waiting as one batch
+                batch = [self._queue.get()]
+                while len(batch) < self._batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if any(record is _CLOSE for record in batch):
+                    batch = [record for record in batch if record is not _CLOSE]
+                    done = True
+                self._write(out, batch)
+
+            if self._dropped:
+                self._write(out, [(logging.WARNING, f"dropped {self._dropped} log messages", None)])
+        finally:
+            if out is not None:
+                out.close()
+
+    def _write(self, out, batch: list):
+        lines, error_lines = [], []
+        for level, msg, exc in batch:
+            line = logging.getLevelName(level) + ":" + msg + "\n"
+            if exc is not None:
+                line += "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            # without a log file warnings and errors go to stderr, as in StdOutReporter
+            if out is None and level >= logging.WARNING:
+                error_lines.append(line)
+            else:
+                lines.append(line)
+
+        if out is not None:
+            out.write("".join(lines))
+            out.flush()
+        else:
+            if lines:
+                sys.stdout.write("".join(lines))
+                sys.stdout.flush()
+            if error_lines:
+                sys.stderr.write("".join(error_lines))
+                sys.stderr.flush()
@@ -0,0 +1,83 @@
+import json
+import os
+from typing import Dict, Iterator, Set, Tuple
+
+
+def session_key(settings: dict) -> str:
+    """Key that identifies a session in a checkpoint file by its settings."""
+    return json.dumps(settings, sort_keys=True)
+
+
+def read_checkpoint(checkpoint_file: str) -> Iterator[Tuple[dict, dict]]:
+    """Iterates over the (settings, results_summary) pairs stored in a checkpoint file.
+
+    A line that was only partially written (e.g. the process got killed while
+    writing it) is skipped, that session is simply run again.
+    """
+    if not os.path.exists(checkpoint_file):
+        return
+
+    with open(checkpoint_file, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield record["settings"], record["results_summary"]
+
+
+def finished_sessions(checkpoint_file: str) -> Set[str]:
+    """Returns the keys of all sessions that are stored in a checkpoint file.
+
+    Sessions that ended in an ERROR (e.g. because their worker process died) do not
+    count as finished, they are run again when the tournament is resumed.
+    """
+    return {
+        session_key(settings)
+        for settings, results_summary in read_checkpoint(checkpoint_file)
+        if results_summary.get("result") != "ERROR"
+    }
+
+
+def latest_summaries(checkpoint_file: str) -> Dict[str, dict]:
+    """Returns the results summary of every session in a checkpoint file by its key.
+
+    A session that was run again after an ERROR has its latest summary last in the
+    checkpoint file, which replaces the earlier ones.
+    """
+    return {
+        session_key(settings): results_summary
+        for settings, results_summary in read_checkpoint(checkpoint_file)
+    }
+
+
+class CheckpointWriter:
+    """Append-only JSONL writer, every finished session is flushed to disk immediately."""
+
+    def __init__(self, checkpoint_file: str):
+        directory = os.path.dirname(checkpoint_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._file = open(checkpoint_file, "a+")
+
+        # start on a new line if the previous run got killed halfway through a line
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, settings: dict, results_summary: dict):
+        record = {"settings": settings, "results_summary": results_summary}
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
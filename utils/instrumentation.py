@@ -0,0 +1,149 @@
+import importlib
+import sys
+import threading
+import time
+import types
+from collections import defaultdict
+from itertools import count
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from geniusweb.inform.Inform import Inform
+from geniusweb.inform.Settings import Settings
+
+# name of the synthetic modules that hold the timed agent classes
+_MODULE_PREFIX = "utils._timed_agents_"
+# kinds of Inform of a SAOP session, by the name they get in the summary statistics
+INFORM_TYPES = {
+    "Settings": "settings",
+    "ActionDone": "action_done",
+    "YourTurn": "your_turn",
+    "Finished": "finished",
+}
+
+
+class Timing(NamedTuple):
+    inform: str
+    wall_time: float
+    cpu_time: float
+
+
+# timings per party id, filled by the timed agents of the sessions in this process
+_timings: Dict[str, List[Timing]] = defaultdict(list)
+# classpath of every timed agent class by the classpath of the original agent
+_timed_classpaths: Dict[str, str] = {}
+_timed_modules = count()
+_local = threading.local()
+
+
+def timed_classpath(agent_classpath: str) -> str:
+    """
+    Returns the classpath of a subclass of the agent that times every call of
+    `notifyChange`. The subclass has the same class name as the agent, so session
+    summaries keep reporting the original agent name.
+
+    Calls are timed exclusive of nested `notifyChange` calls (e.g. an ActionDone
+    that is delivered while the agent is still handling its YourTurn), so the time
+    of every call is attributed to the party that spent it.
+    """
+    module_name, class_name = agent_classpath.rsplit(".", 1)
+    agent_class = getattr(importlib.import_module(module_name), class_name)
+
+    # an agent module that was reloaded (see utils.worker_pool) gets a new timed class
+    timed = _timed_classpaths.get(agent_classpath, None)
+    if timed is None or agent_class not in _resolve(timed).__bases__:
+        timed_module = types.ModuleType(f"{_MODULE_PREFIX}{next(_timed_modules)}")
+        setattr(timed_module, class_name, _timed_class(agent_class, timed_module.__name__))
+        sys.modules[timed_module.__name__] = timed_module
+        _timed_classpaths[agent_classpath] = f"{timed_module.__name__}.{class_name}"
+
+    return _timed_classpaths[agent_classpath]
+
+
+def _resolve(classpath: str) -> type:
+    module_name, class_name = classpath.rsplit(".", 1)
+    return getattr(sys.modules[module_name], class_name)
+
+
+def original_classpath(classpath: str) -> str:
+    """Inverse of `timed_classpath`, other classpaths are returned unchanged."""
+    for original, timed in _timed_classpaths.items():
+        if timed == classpath:
+            return original
+    return classpath
+
+
+def reset_timings():
+    _timings.clear()
+
+
+def pop_timings(party: str) -> List[Timing]:
+    """Returns and removes the timings of a party (by party id name)."""
+    return _timings.pop(party, [])
+
+
+def last_timing(party: str, inform: str) -> Optional[Timing]:
+    """Returns the most recent timing of a party (by party id name) for a kind of
+    Inform (e.g. "YourTurn"), None if there is none."""
+    for timing in reversed(_timings.get(party, [])):
+        if timing.inform == inform:
+            return timing
+    return None
+
+
+def turn_statistics(timings: List[Timing]) -> dict:
+    """p50, p95 and max of the YourTurn wall times and the total CPU time of a party,
+    and per kind of Inform (see `INFORM_TYPES`) the number of calls and their total
+    wall and CPU time (e.g. "inform_action_done_calls", "inform_action_done_time" and
+    "inform_action_done_cpu_time")."""
+    turn_times = [t.wall_time for t in timings if t.inform == "YourTurn"]
+    if not turn_times:
+        turn_times = [0.0]
+
+    statistics = {
+        "turn_time_p50": float(np.percentile(turn_times, 50)),
+        "turn_time_p95": float(np.percentile(turn_times, 95)),
+        "turn_time_max": float(max(turn_times)),
+        "cpu_time": float(sum(t.cpu_time for t in timings)),
+    }
+    for inform, name in INFORM_TYPES.items():
+        inform_timings = [t for t in timings if t.inform == inform]
+        statistics[f"inform_{name}_calls"] = len(inform_timings)
+        statistics[f"inform_{name}_time"] = float(sum(t.wall_time for t in inform_timings))
+        statistics[f"inform_{name}_cpu_time"] = float(sum(t.cpu_time for t in inform_timings))
+
+    return statistics
+
+
+def _timed_class(agent_class: type, module_name: str) -> type:
+    def notifyChange(self, info: Inform):
+        if isinstance(info, Settings):
+            self._timed_party = info.getID().getName()
+
+        # time spent in nested calls is subtracted from this call
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append([0.0, 0.0])
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            agent_class.notifyChange(self, info)
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.thread_time() - start_cpu
+            nested_wall, nested_cpu = stack.pop()
+            if stack:
+                stack[-1][0] += wall_time
+                stack[-1][1] += cpu_time
+
+            party = getattr(self, "_timed_party", None)
+            if party is not None:
+                _timings[party].append(
+                    Timing(type(info).__name__, wall_time - nested_wall, cpu_time - nested_cpu)
+                )
+
+    return type(
+        agent_class.__name__,
+        (agent_class,),
+        {"notifyChange": notifyChange, "__module__": module_name},
+    )
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import numpy as np
+import plotly.graph_objects as go
+
+from utils.results_store import ResultsTable
+
+# matrices shown per domain: (field of `ResultsTable.matrix`, title, color range)
+HEATMAPS = [
+    ("agreement_rate", "agreement rate", [0, 1]),
+    ("utility", "mean utility of the row agent", [0, 1]),
+    ("nash_product", "mean Nash product", [0, 1]),
+]
+
+
+def plot_tournament(results_table: ResultsTable, plot_file: str):
+    """Writes a single html page with agent-vs-agent heatmaps of the agreement rate,
+    utility and Nash product, over all sessions and per domain.
+
+    Only the aggregated matrices end up in the page, so its size depends on the
+    number of agents and domains, not on the number of sessions.
+    """
+    agents = results_table.getAgents()
+    sections = [("all domains", None)] + [(d, d) for d in sorted(results_table.getDomains())]
+
+    html = []
+    # plotly.js is loaded once from a CDN for all figures
+    include_plotlyjs = "cdn"
+    for title, domain in sections:
+        html.append(f"<h2>{title}</h2>")
+        html.append('<div style="display: flex; flex-wrap: wrap;">')
+        for field, field_title, zrange in HEATMAPS:
+            means, counts = results_table.matrix(field, domain)
+            fig = go.Figure(
+                go.Heatmap(
+                    z=np.round(means, 3),
+                    x=agents,
+                    y=agents,
+                    zmin=zrange[0],
+                    zmax=zrange[1],
+                    colorscale="Viridis",
+                    customdata=counts,
+                    hovertemplate="%{y} vs %{x}<br>%{z}<br>%{customdata} sessions<extra></extra>",
+                )
+            )
+            fig.update_layout(
+                title=field_title,
+                width=550,
+                height=500,
+                xaxis={"title": "opponent", "tickangle": -45},
+                yaxis={"title": "agent", "autorange": "reversed"},
+            )
+            html.append(fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs))
+            include_plotlyjs = False
+        html.append("</div>")
+
+    with open(f"{os.path.splitext(plot_file)[0]}.html", "w") as f:
+        f.write("<html><head><meta charset=\"utf-8\" /></head><body>\n")
+        f.write("\n".join(html))
+        f.write("\n</body></html>\n")
+
+
+def load_results_table(results_dir: str) -> ResultsTable:
+    """The results table of a tournament results directory, built from its summaries
+    if the directory has no `results_table.npz` (e.g. older tournaments)."""
+    table_file = os.path.join(results_dir, "results_table.npz")
+    if os.path.exists(table_file):
+        return ResultsTable.load(table_file)
+
+    with open(os.path.join(results_dir, "tournament.json"), "r") as f:
+        tournament = json.load(f)
+    with open(os.path.join(results_dir, "results_summaries.json"), "r") as f:
+        results_summaries = json.load(f)
+    return ResultsTable.fromSummaries(tournament, results_summaries)
+
+
+if __name__ == "__main__":
+    # create the dashboard of a tournament: python -m utils.plot_tournament results/<timestamp>
+    for results_dir in sys.argv[1:]:
+        plot_tournament(load_results_table(results_dir), f"{results_dir}/tournament_plot.html")
+        print(f"{results_dir}: written {results_dir}/tournament_plot.html")
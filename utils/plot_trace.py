@@ -1,31 +1,60 @@
 import os
+import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from typing import List
 
+import numpy as np
 import plotly.graph_objects as go
 
+from utils.session_trace import trace_actions
+from utils.trace_io import list_trace_files, read_trace
 
-def plot_trace(results_trace: dict, plot_file: str):
+# traces with more actions than this are plotted with WebGL (see `plot_trace`)
+SCALABLE_THRESHOLD = 1000
+
+
+def plot_trace(
+    results_trace: dict, plot_file: str, scalable: bool = None, max_points: int = None
+):
+    """Plots the utilities of the offers of a session to an html file.
+
+    Args:
+        results_trace (dict): compact or legacy trace of the session.
+        plot_file (str): path of the html file.
+        scalable (bool, optional): plot with WebGL and let plotly build the hover
+            text from the bid values on demand, instead of an SVG plot with a hover
+            string per offer. Defaults to True for traces with more than
+            `SCALABLE_THRESHOLD` actions.
+        max_points (int, optional): downsample every line to at most about this many
+            points, keeping the extremes of the concession curves (the agreement is
+            always shown). Defaults to None (no downsampling).
+    """
     utilities = defaultdict(lambda: defaultdict(lambda: {"x": [], "y": [], "bids": []}))
     accept = {"x": [], "y": [], "bids": []}
-    for index, action in enumerate(results_trace["actions"], 1):
-        if "Offer" in action:
-            offer = action["Offer"]
-            actor = offer["actor"]
-            for agent, util in offer["utilities"].items():
+    index = 0
+    for index, action in enumerate(trace_actions(results_trace), 1):
+        if action["action"] == "Offer":
+            actor = action["actor"]
+            for agent, util in action["utilities"].items():
                 utilities[agent][actor]["x"].append(index)
                 utilities[agent][actor]["y"].append(util)
-                utilities[agent][actor]["bids"].append(offer["bid"]["issuevalues"])
-        elif "Accept" in action:
-            offer = action["Accept"]
+                utilities[agent][actor]["bids"].append(action["bid"])
+        elif action["action"] == "Accept":
             index -= 1
-            for agent, util in offer["utilities"].items():
+            for agent, util in action["utilities"].items():
                 accept["x"].append(index)
                 accept["y"].append(util)
-                accept["bids"].append(offer["bid"]["issuevalues"])
+                accept["bids"].append(action["bid"])
+
+    if scalable is None:
+        scalable = index > SCALABLE_THRESHOLD
+    scatter = go.Scattergl if scalable else go.Scatter
 
     fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
+        scatter(
             mode="markers",
             x=accept["x"],
             y=accept["y"],
@@ -39,24 +68,42 @@ def plot_trace(results_trace: dict, plot_file: str):
     for i, (agent, data) in enumerate(utilities.items()):
         for actor, utility in data.items():
             name = "_".join(agent.split("_")[-2:])
-            text = []
-            for bid, util in zip(utility["bids"], utility["y"]):
-                text.append(
-                    "<br>".join(
-                        [f"<b>utility: {util:.3f}</b><br>"]
-                        + [f"{i}: {v}" for i, v in bid.items()]
+            x, y, bids = utility["x"], utility["y"], utility["bids"]
+            if max_points is not None and len(y) > max_points:
+                keep = downsample_indices(np.asarray(y), max_points)
+                x, y, bids = ([values[k] for k in keep] for values in (x, y, bids))
+
+            if scalable:
+                # the hover text is filled in by plotly from the bid values of the hovered point
+                issues = sorted(bids[0]) if bids else []
+                hover = {
+                    "customdata": [[bid.get(issue, "") for issue in issues] for bid in bids],
+                    "hovertemplate": "<br>".join(
+                        ["<b>utility: %{y:.3f}</b><br>"]
+                        + [f"{issue}: %{{customdata[{k}]}}" for k, issue in enumerate(issues)]
                     )
-                )
+                    + "<extra></extra>",
+                }
+            else:
+                text = []
+                for bid, util in zip(bids, y):
+                    text.append(
+                        "<br>".join(
+                            [f"<b>utility: {util:.3f}</b><br>"]
+                            + [f"{i}: {v}" for i, v in bid.items()]
+                        )
+                    )
+                hover = {"hovertext": text, "hoverinfo": "text"}
+
             fig.add_trace(
-                go.Scatter(
+                scatter(
                     mode="lines+markers" if agent == actor else "markers",
-                    x=utilities[agent][actor]["x"],
-                    y=utilities[agent][actor]["y"],
+                    x=x,
+                    y=y,
                     name=f"{name} offered" if agent == actor else f"{name} received",
                     legendgroup=agent,
                     marker={"color": color[i]},
-                    hovertext=text,
-                    hoverinfo="text",
+                    **hover,
                 )
             )
 
@@ -73,3 +120,77 @@ def plot_trace(results_trace: dict, plot_file: str):
     fig.update_xaxes(title_text="round", range=[0, index + 1], ticks="outside")
     fig.update_yaxes(title_text="utility", range=[0, 1], ticks="outside")
     fig.write_html(f"{os.path.splitext(plot_file)[0]}.html")
+
+
+def downsample_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of about `max_points` points of a line that keep its shape: the first
+    and last point and the minimum and maximum of every bucket of points."""
+    size = ceil(len(y) / max(1, max_points // 2 - 1))
+    buckets = ceil(len(y) / size)
+    padded = np.full(buckets * size, np.nan)
+    padded[: len(y)] = y
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+
+    return np.unique(np.concatenate(([0, len(y) - 1], lows, highs)))
+
+
+def plot_traces(
+    results_dir: str, workers: int = None, scalable: bool = None, max_points: int = None
+) -> List[str]:
+    """Plots all trace files of a tournament results directory (its `traces`
+    directory, see `utils.trace_io`) to html files in a `plots` directory, spread
+    over a process pool.
+
+    Args:
+        results_dir (str): the results directory of the tournament.
+        workers (int, optional): number of processes. Defaults to the number of CPUs.
+        scalable (bool, optional): see `plot_trace`. Defaults to None.
+        max_points (int, optional): see `plot_trace`. Defaults to None.
+
+    Returns:
+        List[str]: paths of the html files.
+    """
+    trace_files = list_trace_files([os.path.join(results_dir, "traces")])
+    plots_dir = os.path.join(results_dir, "plots")
+    os.makedirs(plots_dir, exist_ok=True)
+
+    plot_files = [
+        os.path.join(plots_dir, f"{os.path.basename(f).split('.')[0]}.html")
+        for f in trace_files
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        plotted = list(
+            executor.map(
+                _plot_trace_file,
+                trace_files,
+                plot_files,
+                [scalable] * len(trace_files),
+                [max_points] * len(trace_files),
+                # large chunks keep the overhead of many small traces low
+                chunksize=max(1, len(trace_files) // (4 * (workers or os.cpu_count() or 1))),
+            )
+        )
+
+    return [f for f, p in zip(plot_files, plotted) if p]
+
+
+def _plot_trace_file(trace_file: str, plot_file: str, scalable: bool, max_points: int) -> bool:
+    # skipped like by `utils.trace_io.iter_traces`
+    try:
+        results_trace, _ = read_trace(trace_file)
+    except ValueError as e:
+        print(f"WARNING: skipped {trace_file}: {e}", file=sys.stderr)
+        return False
+    plot_trace(results_trace, plot_file, scalable, max_points)
+    return True
+
+
+if __name__ == "__main__":
+    # plot all traces of a tournament: python -m utils.plot_trace results/<timestamp>
+    for results_dir in sys.argv[1:]:
+        plot_files = plot_traces(results_dir, max_points=5000)
+        print(f"{results_dir}: plotted {len(plot_files)} traces")
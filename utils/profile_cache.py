@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Callable
+
+from geniusweb.profile.Profile import Profile
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import \
+    LinearAdditiveUtilitySpace
+from geniusweb.profileconnection.ProfileConnectionFactory import \
+    ProfileConnectionFactory
+from geniusweb.profileconnection.ProfileInterface import ProfileInterface
+from uri.uri import URI
+
+from utils.buffered_reporter import BufferedReporter
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class ProfileCache:
+    """
+    Bounded LRU cache of parsed profiles. Profiles that are read from a file are
+    keyed by their path and modification time, so an edited profile file is
+    parsed again. Profiles from other URIs (e.g. a profile server) are not cached.
+
+    The cache is shared by all sessions that run in the same process.
+    """
+
+    def __init__(self, loader: Callable[[str], Profile], maxsize: int = 128):
+        self._loader = loader
+        self._maxsize = maxsize
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, profile_uri: str) -> Profile:
+        if not profile_uri.startswith("file:"):
+            return self._loader(profile_uri)
+
+        path = os.path.abspath(profile_uri[len("file:"):])
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            entry = self._profiles.get(path)
+            if entry is not None and entry[0] == mtime:
+                self._hits += 1
+                self._profiles.move_to_end(path)
+                return entry[1]
+            self._misses += 1
+
+        profile = self._loader(profile_uri)
+
+        with self._lock:
+            self._profiles[path] = (mtime, profile)
+            self._profiles.move_to_end(path)
+            while len(self._profiles) > self._maxsize:
+                self._profiles.popitem(last=False)
+
+        return profile
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._profiles))
+
+    def cache_clear(self):
+        with self._lock:
+            self._profiles.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+def get_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
+    """Returns the parsed profile, profile files are only parsed once per process
+    (see `profile_cache_info` for the hit and miss counts)."""
+    return _profile_cache.get(profile_uri)
+
+
+def profile_cache_info():
+    """Hit and miss counts of the profile cache of this process."""
+    return _profile_cache.cache_info()
+
+
+def serve_profiles_from_cache():
+    """Makes `ProfileConnectionFactory.create` serve the profile files of the agents from
+    the profile cache of this process, so that agents do not parse their profile again
+    in every session. Profiles from other URIs are connected by geniusweb as usual.
+
+    Affects all agents in this process, it is meant for worker processes (see
+    `utils.warm_up.warm_up_worker`).
+    """
+    def create(uri: URI, reporter) -> ProfileInterface:
+        if str(uri).startswith("file:"):
+            return CachedProfileConnection(get_utility_function(str(uri)))
+        return _create_profile_connection(uri, reporter)
+
+    ProfileConnectionFactory.create = staticmethod(create)
+
+
+class CachedProfileConnection(ProfileInterface):
+    """
+    Connection to a profile of the profile cache (see `serve_profiles_from_cache`). The
+    profile is shared with other sessions in the process, it is never changed.
+    """
+
+    def __init__(self, profile: LinearAdditiveUtilitySpace):
+        self._profile = profile
+
+    def getProfile(self) -> LinearAdditiveUtilitySpace:
+        return self._profile
+
+    def close(self):
+        pass
+
+
+def _load_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
+    # only problems with loading the profile are worth reporting
+    with BufferedReporter(level=logging.WARNING) as reporter:
+        profile_connection = _create_profile_connection(URI(profile_uri), reporter)
+        profile = profile_connection.getProfile()
+    assert isinstance(profile, LinearAdditiveUtilitySpace)
+
+    return profile
+
+
+# the factory of geniusweb itself, `serve_profiles_from_cache` replaces the one of the class
+_create_profile_connection = ProfileConnectionFactory.create
+_profile_cache = ProfileCache(_load_utility_function)
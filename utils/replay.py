@@ -0,0 +1,123 @@
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Sequence, Tuple
+
+from utils.bid_index import get_bid_index
+from utils.session_runner import summarize_trace
+from utils.trace_io import iter_traces, list_trace_files, read_trace
+
+# summary fields that can not be recomputed from a trace and are kept from the recorded summary
+RECORDED_FIELDS = ("seed", "error")
+RECORDED_PREFIXES = ("turn_time_", "cpu_time_", "inform_")
+# the traces of a tournament are named after the index of their session (see `utils.runners.run_tournament`)
+SESSION_TRACE_NAME = re.compile(r"session_(\d+)\.")
+
+
+def replay_trace(results_trace: dict, recorded_summary: dict = None) -> Tuple[dict, dict]:
+    """Recomputes the utilities and the summary of a recorded session from its compact
+    trace (see `utils.session_trace`), without running the agents.
+
+    The utilities are computed from the current profile files, with the same exact
+    arithmetic as a live session, so metrics that are added to `summarize_trace`
+    later also become available for recorded sessions.
+
+    Args:
+        results_trace (dict): compact trace of the session (e.g. from `utils.trace_io`).
+        recorded_summary (dict, optional): the recorded summary, of which the fields
+            that can not be recomputed (seed, error and timings) are kept. Defaults to None.
+    """
+    partyprofiles = results_trace["partyprofiles"]
+    actions = results_trace["actions"]
+    if actions:
+        profiles = {party: p["profile"][len("file:"):] for party, p in partyprofiles.items()}
+        index = get_bid_index(list(profiles.values()))
+        encoded = index.encodeValues([a["bid"] for a in actions])
+        for party, profile in profiles.items():
+            utilities = index.getUtilitiesEncoded(profile, encoded)
+            for action, utility in zip(actions, utilities.tolist()):
+                action["utilities"][party] = utility
+
+    num_actions = None
+    if recorded_summary is not None:
+        # the trace only holds the offers and accepts of the session
+        num_actions = recorded_summary.get("num_offers", None)
+    results_summary = summarize_trace(results_trace, num_actions)
+
+    if recorded_summary is not None:
+        for key, value in recorded_summary.items():
+            if key in RECORDED_FIELDS or key.startswith(RECORDED_PREFIXES):
+                results_summary[key] = value
+    if "seed" in results_trace:
+        results_summary["seed"] = results_trace["seed"]
+
+    return results_trace, results_summary
+
+
+def replay_traces(paths: Sequence[str], workers: int = 1) -> Iterator[Tuple[str, dict]]:
+    """Yields (path, results_summary) of the replayed sessions of trace files and/or
+    directories of trace files (see `utils.trace_io.iter_traces`), in sorted order.
+
+    Args:
+        paths (Sequence[str]): trace files and/or directories.
+        workers (int, optional): number of processes to spread the traces over. Defaults to 1.
+    """
+    if workers <= 1:
+        for path, results_trace, recorded_summary in iter_traces(paths):
+            _, results_summary = replay_trace(results_trace, recorded_summary)
+            yield path, results_summary
+        return
+
+    files = list_trace_files(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, results_summary in zip(files, executor.map(_replay_file, files, chunksize=64)):
+            if results_summary is not None:
+                yield path, results_summary
+
+
+def session_index(path: str) -> Optional[int]:
+    """Index of the session of a trace file of a tournament in the tournament, None if
+    the file is not named after a session."""
+    match = SESSION_TRACE_NAME.match(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def _replay_file(path: str) -> Optional[dict]:
+    # skipped like by `utils.trace_io.iter_traces`
+    try:
+        results_trace, recorded_summary = read_trace(path)
+    except ValueError as e:
+        print(f"WARNING: skipped {path}: {e}", file=sys.stderr)
+        return None
+    return replay_trace(results_trace, recorded_summary)[1]
+
+
+if __name__ == "__main__":
+    # recompute the summaries of a tournament from its traces: python -m utils.replay results/<timestamp>
+    from utils.results_store import ResultsTable
+
+    for results_dir in sys.argv[1:]:
+        with open(os.path.join(results_dir, "tournament.json"), "r") as f:
+            tournament = json.load(f)
+
+        # match the traces to their sessions by name, the sorted names are not in the
+        # order of the sessions beyond 9999 sessions and sessions may have no trace
+        replayed = {}
+        for path, results_summary in replay_traces(
+            [os.path.join(results_dir, "traces")], workers=os.cpu_count() or 1
+        ):
+            index = session_index(path)
+            if index is None or index >= len(tournament):
+                print(f"{path}: not a trace of a session of the tournament, skipped", file=sys.stderr)
+                continue
+            replayed[index] = results_summary
+        indices = sorted(replayed)
+        results_summaries = [replayed[index] for index in indices]
+        with open(os.path.join(results_dir, "results_summaries_replayed.json"), "w") as f:
+            f.write(json.dumps(results_summaries, indent=2))
+
+        results_table = ResultsTable.fromSummaries([tournament[index] for index in indices], results_summaries)
+        results_table.save(os.path.join(results_dir, "results_table_replayed.npz"))
+        print(f"{results_dir}: replayed {len(results_summaries)} of {len(tournament)} sessions")
@@ -0,0 +1,206 @@
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# columns of the results table, categorical columns are stored as codes into a list of names
+TABLE_DTYPE = np.dtype(
+    [
+        ("agent_1", np.int32),
+        ("agent_2", np.int32),
+        ("domain", np.int32),
+        ("result", np.int8),
+        ("num_offers", np.int64),
+        ("utility_1", np.float64),
+        ("utility_2", np.float64),
+        ("nash_product", np.float64),
+        ("social_welfare", np.float64),
+        ("pareto_distance", np.float64),
+        ("nash_distance", np.float64),
+        ("kalai_distance", np.float64),
+    ]
+)
+# columns that are NaN when they are missing from a summary
+NUMERIC_FIELDS = TABLE_DTYPE.names[5:]
+
+LEADERBOARD_DTYPE = np.dtype(
+    [
+        ("agent", object),
+        ("sessions", np.int64),
+        ("utility", np.float64),
+        ("agreement_rate", np.float64),
+        ("nash_product", np.float64),
+        ("social_welfare", np.float64),
+    ]
+)
+
+
+class ResultsTable:
+    """
+    Columnar table of the session summaries of a tournament, one row per session.
+
+    The rows are a NumPy structured array in which the agents, domains and results
+    (session outcomes) are stored as integer codes, so that aggregations are a few
+    `np.bincount` calls instead of loops over summary dicts. Missing numbers (e.g.
+    the efficiency metrics of a crashed session) are NaN.
+    """
+
+    def __init__(
+        self, table: np.ndarray, agents: List[str], domains: List[str], results: List[str]
+    ):
+        self._table = table
+        self._agents = agents
+        self._domains = domains
+        # result 0 is always "agreement"
+        self._results = results
+
+    @staticmethod
+    def fromSummaries(tournament: Sequence[dict], results_summaries: Sequence[dict]) -> "ResultsTable":
+        """Builds the table from the session settings and result summaries of a tournament.
+
+        The domain of a session is the name of the directory of its first profile.
+        """
+        agents, domains, results = {}, {}, {"agreement": 0}
+        columns = {field: [] for field in TABLE_DTYPE.names}
+        for settings, summary in zip(tournament, results_summaries):
+            columns["agent_1"].append(agents.setdefault(summary["agent_1"], len(agents)))
+            columns["agent_2"].append(agents.setdefault(summary["agent_2"], len(agents)))
+            domain = profile_domain(settings["profiles"][0])
+            columns["domain"].append(domains.setdefault(domain, len(domains)))
+            columns["result"].append(results.setdefault(summary["result"], len(results)))
+            columns["num_offers"].append(summary.get("num_offers", 0))
+            for field in NUMERIC_FIELDS:
+                columns[field].append(summary.get(field, np.nan))
+
+        table = np.empty(len(results_summaries), dtype=TABLE_DTYPE)
+        for field, column in columns.items():
+            table[field] = column
+
+        return ResultsTable(table, list(agents), list(domains), list(results))
+
+    @staticmethod
+    def load(path: str) -> "ResultsTable":
+        with np.load(path) as arrays:
+            return ResultsTable(
+                arrays["table"],
+                arrays["agents"].tolist(),
+                arrays["domains"].tolist(),
+                arrays["results"].tolist(),
+            )
+
+    def save(self, path: str):
+        """Saves the table as a compressed `.npz` file."""
+        np.savez_compressed(
+            path,
+            table=self._table,
+            agents=np.array(self._agents, dtype=str),
+            domains=np.array(self._domains, dtype=str),
+            results=np.array(self._results, dtype=str),
+        )
+
+    def size(self) -> int:
+        return len(self._table)
+
+    def getTable(self) -> np.ndarray:
+        return self._table
+
+    def getAgents(self) -> List[str]:
+        return self._agents
+
+    def getDomains(self) -> List[str]:
+        return self._domains
+
+    def getResults(self) -> List[str]:
+        return self._results
+
+    def leaderboard(self, domain: str = None) -> np.ndarray:
+        """Per agent the number of sessions, mean utility, agreement rate, mean Nash
+        product and mean social welfare, sorted by descending mean utility.
+
+        Every session counts for both of its agents, with their own utility.
+
+        Args:
+            domain (str, optional): only use the sessions on this domain. Defaults to None.
+        """
+        table = self._select(domain)
+        agents = np.concatenate((table["agent_1"], table["agent_2"]))
+        agreement = np.tile(table["result"] == 0, 2)
+        utility = np.concatenate((table["utility_1"], table["utility_2"]))
+        nash_product = np.tile(table["nash_product"], 2)
+        social_welfare = np.tile(table["social_welfare"], 2)
+
+        num_agents = len(self._agents)
+        sessions = np.bincount(agents, minlength=num_agents)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            def mean(values):
+                return np.bincount(agents, weights=values, minlength=num_agents) / sessions
+
+            leaderboard = np.zeros(num_agents, dtype=LEADERBOARD_DTYPE)
+            leaderboard["agent"] = self._agents
+            leaderboard["sessions"] = sessions
+            leaderboard["utility"] = mean(utility)
+            leaderboard["agreement_rate"] = mean(agreement)
+            leaderboard["nash_product"] = mean(nash_product)
+            leaderboard["social_welfare"] = mean(social_welfare)
+
+        leaderboard = leaderboard[sessions > 0]
+        return leaderboard[np.argsort(-leaderboard["utility"], kind="stable")]
+
+    def matrix(self, field: str, domain: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Agent-vs-agent matrix of the mean of a field over the sessions of each pair.
+
+        Entry (i, j) aggregates the sessions in which agent i met agent j, from the
+        perspective of agent i: for "utility" it is the mean utility of agent i, the
+        other fields ("agreement_rate", "nash_product", "social_welfare", ...) are
+        symmetric. Pairs that never met are NaN.
+
+        Args:
+            field (str): "utility", "agreement_rate" or a numeric column of the table.
+            domain (str, optional): only use the sessions on this domain. Defaults to None.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the mean and the number of sessions per pair.
+        """
+        table = self._select(domain)
+        rows = np.concatenate((table["agent_1"], table["agent_2"]))
+        columns = np.concatenate((table["agent_2"], table["agent_1"]))
+
+        if field == "utility":
+            values = np.concatenate((table["utility_1"], table["utility_2"]))
+        elif field == "agreement_rate":
+            values = np.tile(table["result"] == 0, 2).astype(np.float64)
+        else:
+            values = np.tile(table[field], 2)
+
+        num_agents = len(self._agents)
+        cells = rows * num_agents + columns
+        size = num_agents * num_agents
+        counts = np.bincount(cells, minlength=size).reshape(num_agents, num_agents)
+        # sessions of an agent against itself are counted from both sides
+        sums = np.bincount(cells, weights=values, minlength=size).reshape(num_agents, num_agents)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        counts = counts.copy()
+        counts[np.diag_indices(num_agents)] //= 2
+
+        return means, counts
+
+    def _select(self, domain: str = None) -> np.ndarray:
+        if domain is None:
+            return self._table
+        return self._table[self._table["domain"] == self._domains.index(domain)]
+
+
+def profile_domain(profile: str) -> str:
+    """Name of the domain of a profile file: the name of the directory it is in."""
+    return os.path.basename(os.path.dirname(os.path.normpath(profile)))
+
+
+def format_leaderboard(leaderboard: np.ndarray) -> str:
+    lines = [f"{'agent':>20} {'sessions':>9} {'utility':>8} {'agreement':>10} {'nash':>8} {'welfare':>8}"]
+    for row in leaderboard:
+        lines.append(
+            f"{row['agent']:>20} {row['sessions']:>9} {row['utility']:8.3f} "
+            f"{row['agreement_rate']:10.3f} {row['nash_product']:8.3f} {row['social_welfare']:8.3f}"
+        )
+    return "\n".join(lines)
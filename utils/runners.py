@@ -1,96 +1,64 @@
-import logging
+import os
+import random
 from itertools import permutations
 from math import factorial
-from typing import Tuple
-
-from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import \
-    LinearAdditiveUtilitySpace
-from geniusweb.profileconnection.ProfileConnectionFactory import \
-    ProfileConnectionFactory
-from geniusweb.protocol.NegoSettings import NegoSettings
-from geniusweb.protocol.session.saop.SAOPState import SAOPState
-from geniusweb.simplerunner.ClassPathConnectionFactory import \
-    ClassPathConnectionFactory
-from geniusweb.simplerunner.NegoRunner import NegoRunner
-from pyson.ObjectMapper import ObjectMapper
-from uri.uri import URI
+from typing import Iterator, List, Tuple
 
 from utils.ask_proceed import ask_proceed
-from utils.std_out_reporter import StdOutReporter
-
-
-def run_session(settings) -> Tuple[dict, dict]:
-    agents = settings["agents"]
-    profiles = settings["profiles"]
-    rounds = settings["deadline_rounds"]
-
-    # quick and dirty checks
-    assert isinstance(agents, list) and len(agents) == 2
-    assert isinstance(profiles, list) and len(profiles) == 2
-    assert isinstance(rounds, int) and rounds > 0
-
-    # file path to uri
-    profiles_uri = [f"file:{x}" for x in profiles]
-
-    # create full settings dictionary that geniusweb requires
-    settings_full = {
-        "SAOPSettings": {
-            "participants": [
-                {
-                    "TeamInfo": {
-                        "parties": [
-                            {
-                                "party": {
-                                    "partyref": f"pythonpath:{agents[0]}",
-                                    "parameters": {},
-                                },
-                                "profile": profiles_uri[0],
-                            }
-                        ]
-                    }
-                },
-                {
-                    "TeamInfo": {
-                        "parties": [
-                            {
-                                "party": {
-                                    "partyref": f"pythonpath:{agents[1]}",
-                                    "parameters": {},
-                                },
-                                "profile": profiles_uri[1],
-                            }
-                        ]
-                    }
-                },
-            ],
-            "deadline": {"DeadlineRounds": {"rounds": rounds, "durationms": 60000}},
-        }
-    }
-
-    # parse settings dict to settings object
-    settings_obj = ObjectMapper().parse(settings_full, NegoSettings)
-
-    # create the negotiation session runner object
-    runner = NegoRunner(settings_obj, ClassPathConnectionFactory(), StdOutReporter(), 0)
-
-    # run the negotiation session
-    runner.run()
-
-    # get results from the session in class format and dict format
-    results_class: SAOPState = runner.getProtocol().getState()
-    results_dict = ObjectMapper().toJson(results_class)
-
-    # add utilities to the results and create a summary
-    results_trace, results_summary = process_results(results_class, results_dict)
-
-    return results_trace, results_summary
-
-
-def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
+from utils.async_runner import iter_sessions_async
+from utils.checkpoint import (CheckpointWriter, finished_sessions,
+                              latest_summaries, session_key)
+from utils.session_runner import (SESSION_LIMITS, TOURNAMENT_SESSION_SETTINGS,
+                                  iter_sessions_serial)
+from utils.worker_pool import WorkerPool, iter_sessions_pool
+
+
+def run_tournament(
+    tournament_settings: dict,
+    workers: int = 1,
+    checkpoint_file: str = None,
+    log_dir: str = None,
+    trace_dir: str = None,
+    max_concurrent: int = None,
+    pool=None,
+) -> Tuple[list, list]:
+    """Runs every agent against every other agent on every profile set.
+
+    Args:
+        tournament_settings (dict): agents, profile_sets and deadline_rounds and/or
+            deadline_time_ms, optionally the engine and time limits of every session
+            (see `utils.session_runner.run_session`), a seed from which the seeds of the sessions are derived
+            and "parameters": the parameters of an agent (e.g. {"delay": 1.0}) by its
+            classpath, which it gets in all of its sessions.
+        workers (int, optional): number of processes to spread the sessions over.
+            Results are returned in the same order as a serial run. Defaults to 1.
+        checkpoint_file (str, optional): JSONL file to which every finished session
+            is appended. Sessions that are already in this file are not run again
+            (unless they ended in an ERROR), which allows an interrupted tournament
+            to be resumed. Defaults to None.
+        log_dir (str, optional): directory to which the log messages of every session
+            are written (one file per session) instead of to the terminal. Defaults to None.
+        trace_dir (str, optional): directory to which the trace of every session is
+            written as a compressed trace file (see `utils.trace_io`). Defaults to None.
+        max_concurrent (int, optional): run the sessions of every worker interleaved in
+            an asyncio event loop with at most this many sessions at once (see
+            `utils.async_runner`). Defaults to None (one session at a time).
+        pool (utils.worker_pool.WorkerPool, optional): long-lived pool of warm worker
+            processes to run the sessions on, instead of `workers` new processes.
+            Defaults to None.
+
+    Returns:
+        Tuple[list, list]: settings and result summary of every session.
+    """
     # create agent permutations, ensures that every agent plays against every other agent on both sides of a profile set.
     agents = tournament_settings["agents"]
     profile_sets = tournament_settings["profile_sets"]
-    deadline_rounds = tournament_settings["deadline_rounds"]
+
+    # checked once here, instead of in a child process of every session (see utils.session_runner.run_session)
+    if tournament_settings.get("engine", "geniusweb") == "geniusweb" and any(
+        tournament_settings.get(key, None) is not None for key in SESSION_LIMITS
+    ):
+        raise ValueError("time limits of the agents are only enforced by the local engine")
 
     num_sessions = (factorial(len(agents)) // factorial(len(agents) - 2)) * len(profile_sets)
     if num_sessions > 100:
@@ -99,8 +67,14 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
             print("Exiting script")
             exit()
 
+    for directory in (log_dir, trace_dir):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    # the seeds of the sessions are part of their settings, so a resumed tournament gets the same seeds
+    seeds = random.Random(tournament_settings["seed"]) if "seed" in tournament_settings else None
+    agent_parameters = tournament_settings.get("parameters", {})
 
-    results_summaries = []
     tournament = []
     for profiles in profile_sets:
         # quick an dirty check
@@ -110,96 +84,64 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
             settings = {
                 "agents": list(agent_duo),
                 "profiles": profiles,
-                "deadline_rounds": deadline_rounds,
             }
+            for key in TOURNAMENT_SESSION_SETTINGS:
+                if key in tournament_settings:
+                    settings[key] = tournament_settings[key]
+            # only sessions with parameters get them, so that they keep their key in a checkpoint file
+            if any(agent in agent_parameters for agent in agent_duo):
+                settings["parameters"] = [dict(agent_parameters.get(agent, {})) for agent in agent_duo]
+            if seeds is not None:
+                settings["seed"] = seeds.randrange(2 ** 32)
+            if log_dir is not None:
+                settings["log_file"] = os.path.join(log_dir, f"session_{len(tournament):04d}.log")
+            if trace_dir is not None:
+                settings["trace_file"] = os.path.join(trace_dir, f"session_{len(tournament):04d}.jsonl.gz")
+            tournament.append(settings)
 
-            # run a single negotiation session
-            _, results_summary = run_session(settings)
+    if checkpoint_file is None:
+        # keep the summaries in memory, a crashing session results in an error summary
+        results_summaries = [None] * len(tournament)
+        for index, results_summary in run_sessions(tournament, workers, max_concurrent, pool):
+            results_summaries[index] = results_summary
+        return tournament, results_summaries
 
-            # assemble results
-            tournament.append(settings)
-            results_summaries.append(results_summary)
+    # skip the sessions that already finished in a previous run
+    finished = finished_sessions(checkpoint_file)
+    pending = [s for s in tournament if session_key(s) not in finished]
+    if len(pending) < len(tournament):
+        print(f"Resuming tournament: {len(tournament) - len(pending)} of {len(tournament)} sessions already finished")
+
+    # stream every finished session to disk
+    with CheckpointWriter(checkpoint_file) as checkpoint:
+        for index, results_summary in run_sessions(pending, workers, max_concurrent, pool):
+            checkpoint.write(pending[index], results_summary)
+
+    # collect the results in the order of the tournament
+    summaries_by_key = latest_summaries(checkpoint_file)
+    results_summaries = [summaries_by_key[session_key(s)] for s in tournament]
 
     return tournament, results_summaries
 
 
-def process_results(results_class: SAOPState, results_dict):
-    results_dict = results_dict["SAOPState"]
-
-    # dict to translate geniusweb agent reference to Python class name
-    agent_translate = {
-        k: v["party"]["partyref"].split(".")[-1]
-        for k, v in results_dict["partyprofiles"].items()
-    }
-
-    results_summary = {}
-
-    # check if there are any actions (could have crashed)
-    if results_dict["actions"]:
-        # obtain utility functions
-        utility_funcs = {
-            k: get_utility_function(v["profile"])
-            for k, v in results_dict["partyprofiles"].items()
-        }
-
-        # iterate both action classes and dict entries
-        actions_iter = zip(results_class.getActions(), results_dict["actions"])
-
-        for num_offer, (action_class, action_dict) in enumerate(actions_iter):
-            if "Offer" in action_dict:
-                offer = action_dict["Offer"]
-            elif "Accept" in action_dict:
-                offer = action_dict["Accept"]
-            else:
-                continue
-
-            # add bid utility of both agents if bid is not None
-            bid = action_class.getBid()
-            if bid is None:
-                raise ValueError(f"Found `None` value in sequence of actions: {action_class}")
-            else:
-                offer["utilities"] = {
-                    k: float(v.getUtility(bid)) for k, v in utility_funcs.items()
-                }
-
-        results_summary["num_offers"] = num_offer + 1
-
-        # gather a summary of results
-        if "Accept" in action_dict:
-            for actor, utility in offer["utilities"].items():
-                position = actor.split("_")[-1]
-                results_summary[f"agent_{position}"] = agent_translate[actor]
-                results_summary[f"utility_{position}"] = utility
-            util_1, util_2 = offer["utilities"].values()
-            results_summary["nash_product"] = util_1 * util_2
-            results_summary["social_welfare"] = util_1 + util_2
-            results_summary["result"] = "agreement"
-        else:
-            for actor, utility in offer["utilities"].items():
-                position = actor.split("_")[-1]
-                results_summary[f"agent_{position}"] = agent_translate[actor]
-                results_summary[f"utility_{position}"] = 0
-            results_summary["nash_product"] = 0
-            results_summary["social_welfare"] = 0
-            results_summary["result"] = "failed"
-    else:
-        # something crashed crashed
-        for actor in results_dict["connections"]:
-            position = actor.split("_")[-1]
-            results_summary[f"agent_{position}"] = agent_translate[actor]
-            results_summary[f"utility_{position}"] = 0
-        results_summary["nash_product"] = 0
-        results_summary["social_welfare"] = 0
-        results_summary["result"] = "ERROR"
-
-    return results_dict, results_summary
-
-
-def get_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
-    profile_connection = ProfileConnectionFactory.create(
-        URI(profile_uri), StdOutReporter()
-    )
-    profile = profile_connection.getProfile()
-    assert isinstance(profile, LinearAdditiveUtilitySpace)
-
-    return profile
+def run_sessions(
+    sessions: List[dict], workers: int = 1, max_concurrent: int = None, pool: WorkerPool = None
+) -> Iterator[Tuple[int, dict]]:
+    """Runs sessions and yields (index, results_summary) pairs as soon as a session finishes.
+
+    With a single worker the sessions run in order in the current process (see
+    `utils.session_runner.iter_sessions_serial`), otherwise they are spread over a
+    pool of warm worker processes and yielded in order of completion (see
+    `utils.worker_pool.iter_sessions_pool`). With `max_concurrent` the sessions of a
+    worker run interleaved in an asyncio event loop (see
+    `utils.async_runner.iter_sessions_async`). A long-lived `utils.worker_pool.WorkerPool`
+    can be passed as `pool` to run the sessions on instead of a new process pool.
+    """
+    if pool is not None and max_concurrent is not None:
+        raise ValueError("the workers of a worker pool run one session at a time")
+
+    if max_concurrent is not None:
+        return iter_sessions_async(sessions, max_concurrent, workers)
+    if pool is None and workers <= 1:
+        return iter_sessions_serial(sessions)
+    return iter_sessions_pool(sessions, workers, pool)
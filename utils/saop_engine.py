@@ -0,0 +1,483 @@
+import importlib
+import inspect
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from geniusweb.actions.Accept import Accept
+from geniusweb.actions.Action import Action
+from geniusweb.actions.EndNegotiation import EndNegotiation
+from geniusweb.actions.Offer import Offer
+from geniusweb.actions.PartyId import PartyId
+from geniusweb.inform.ActionDone import ActionDone
+from geniusweb.inform.Agreements import Agreements
+from geniusweb.inform.Finished import Finished
+from geniusweb.inform.Inform import Inform
+from geniusweb.inform.Settings import Settings
+from geniusweb.inform.YourTurn import YourTurn
+from geniusweb.party.DefaultParty import DefaultParty
+from geniusweb.progress.Progress import Progress
+from geniusweb.progress.ProgressRounds import ProgressRounds
+from geniusweb.progress.ProgressTime import ProgressTime
+from geniusweb.references.Parameters import Parameters
+from geniusweb.references.PartyRef import PartyRef
+from geniusweb.references.PartyWithParameters import PartyWithParameters
+from geniusweb.references.PartyWithProfile import PartyWithProfile
+from geniusweb.references.ProfileRef import ProfileRef
+from geniusweb.references.ProtocolRef import ProtocolRef
+from tudelft_utilities_logging.Reporter import Reporter
+from uri.uri import URI
+
+
+class LocalConnection:
+    """
+    Connection between the engine and a party in the same process. The party
+    sends its actions through it, the engine collects them after every turn.
+    """
+
+    def __init__(self, party_id: PartyId):
+        self._party_id = party_id
+        self._actions: List[Action] = []
+        self._listeners = []
+
+    def send(self, action: Action):
+        self._actions.append(action)
+
+    def takeActions(self) -> List[Action]:
+        actions, self._actions = self._actions, []
+        return actions
+
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def getRemote(self) -> PartyId:
+        return self._party_id
+
+    def getError(self) -> Optional[Exception]:
+        return None
+
+    def close(self):
+        self._listeners = []
+
+
+class TurnTimeout(Exception):
+    """A party exceeded its turn timeout or its wall-clock or CPU budget."""
+
+
+class PartyThread:
+    """
+    Daemon thread that makes the calls to a party, so that the engine can stop
+    waiting for a party that exceeds its time. Python threads can not be killed: a
+    party that hangs keeps its thread busy, but the thread does not keep the process
+    alive and the party gets no further calls.
+    """
+
+    def __init__(self, name: str):
+        self._calls = queue.Queue()
+        self._results = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def call(self, function, argument, timeout: float) -> float:
+        """Calls a function in the thread of the party and waits for it to return.
+
+        Args:
+            function (Callable): the function to call, with a single argument.
+            argument: the argument of the call.
+            timeout (float): maximum time to wait for the call in seconds.
+
+        Returns:
+            float: CPU time of the call in seconds.
+
+        Raises:
+            TimeoutError: the call did not finish in time.
+        """
+        self._calls.put((function, argument))
+        try:
+            error, cpu_time = self._results.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            raise TimeoutError()
+        if error is not None:
+            raise error
+        return cpu_time
+
+    def close(self):
+        self._calls.put(None)
+
+    def _run(self):
+        while True:
+            call = self._calls.get()
+            if call is None:
+                return
+            function, argument = call
+            start, error = time.thread_time(), None
+            try:
+                function(argument)
+            except Exception as e:
+                error = e
+            self._results.put((error, time.thread_time() - start))
+
+
+class LocalSAOPState:
+    """
+    Final state of a session run by the `SAOPEngine`. It offers the part of the
+    interface of geniusweb's `SAOPState` that `process_results` uses.
+    """
+
+    def __init__(
+        self,
+        actions: List[Action],
+        partyprofiles: Dict[PartyId, PartyWithProfile],
+        progress: Progress,
+        agreements: Agreements,
+        error: Optional[Exception] = None,
+    ):
+        self._actions = actions
+        self._partyprofiles = partyprofiles
+        self._progress = progress
+        self._agreements = agreements
+        self._error = error
+
+    def getActions(self) -> List[Action]:
+        return self._actions
+
+    def getPartyProfiles(self) -> Dict[PartyId, PartyWithProfile]:
+        return self._partyprofiles
+
+    def getProgress(self) -> Progress:
+        return self._progress
+
+    def getAgreements(self) -> Agreements:
+        return self._agreements
+
+    def getError(self) -> Optional[Exception]:
+        return self._error
+
+
+class SAOPEngine:
+    """
+    Runs a SAOP session between parties that are Python classes in the current
+    process, without the settings parsing, connection factories and protocol
+    objects of geniusweb's `NegoRunner`.
+
+    The turn loop follows the SAOP protocol: every party receives its `Settings`,
+    then the parties take turns (`YourTurn`) in order. Every action is broadcast to
+    all parties (`ActionDone`) and the round advances after the last party acted.
+    The session ends with an accept of the last offer, an `EndNegotiation`, the
+    deadline or a protocol error, after which all parties receive `Finished`.
+
+    Parties are named party_1, party_2, ... in the order of the agents.
+
+    With a turn timeout or a time budget, every call to a party runs in a
+    `PartyThread` and the engine waits at most until the first of these limits
+    (or the deadline) is reached. A party that exceeds its turn timeout, wall-clock
+    budget or CPU budget ends the session with a `TurnTimeout` error. The CPU time
+    is only known after a call, a party that hangs is caught by the wall-clock
+    limits or the deadline. The engine stops waiting for such a party but can not
+    stop it, `utils.session_runner.run_session` therefore runs sessions with limits in a
+    child process. Without limits the parties are called directly.
+    """
+
+    def __init__(
+        self,
+        agents: List[str],
+        profiles: List[str],
+        parameters: List[dict],
+        deadline_rounds: Optional[int],
+        durationms: int = 60000,
+        reporter: Reporter = None,
+        turn_timeout_ms: int = None,
+        time_budget_ms: int = None,
+        cpu_budget_ms: int = None,
+        listener: Callable[[Action], None] = None,
+    ):
+        """
+        Args:
+            agents (List[str]): classpaths of the agents (e.g.
+                agents.random_agent.random_agent.RandomAgent).
+            profiles (List[str]): uris of the profiles of the agents (e.g.
+                file:domains/domain00/profileA.json).
+            parameters (List[dict]): parameters of every agent.
+            deadline_rounds (Optional[int]): number of rounds of the session, None for
+                a time based deadline of durationms.
+            durationms (int, optional): maximum duration of the session in milliseconds.
+                Defaults to 60000.
+            reporter (Reporter, optional): reporter for the messages of the engine, also
+                passed to the parties of which the constructor accepts a reporter (like
+                the TimeDependentAgent family). Defaults to None.
+            turn_timeout_ms (int, optional): maximum time of a single call to a party in
+                milliseconds. Defaults to None.
+            time_budget_ms (int, optional): maximum wall-clock time of all calls to a
+                party in milliseconds. Defaults to None.
+            cpu_budget_ms (int, optional): maximum CPU time of all calls to a party in
+                milliseconds. Defaults to None.
+            listener (Callable[[Action], None], optional): called with every action as
+                soon as it is done, before the parties are informed of it (e.g. to write
+                the trace while the session runs). Defaults to None.
+        """
+        self._agents = agents
+        self._profiles = profiles
+        self._parameters = parameters
+        self._deadline_rounds = deadline_rounds
+        self._durationms = durationms
+        self._reporter = reporter
+        self._turn_timeout_ms = turn_timeout_ms
+        self._time_budget_ms = time_budget_ms
+        self._cpu_budget_ms = cpu_budget_ms
+        self._listener = listener
+        self._state: LocalSAOPState = None
+
+    def getState(self) -> LocalSAOPState:
+        """Returns the final state of the session, None before `run` finished."""
+        return self._state
+
+    def run(self):
+        """Runs the complete session."""
+        self.start()
+        while not self.isFinished():
+            self.step()
+        self.finish()
+
+    def start(self):
+        """Creates the parties and sends them their `Settings`. `run` is the same as
+        `start`, `step` until `isFinished` and `finish`, the separate steps allow the
+        caller to do something between the turns (see `utils.async_runner`)."""
+        self._party_ids = [PartyId(f"party_{i}") for i in range(1, len(self._agents) + 1)]
+        self._partyprofiles = {
+            party_id: PartyWithProfile(
+                PartyWithParameters(PartyRef(URI(f"pythonpath:{agent}")), Parameters(params)),
+                ProfileRef(URI(profile)),
+            )
+            for party_id, agent, profile, params in zip(
+                self._party_ids, self._agents, self._profiles, self._parameters
+            )
+        }
+
+        start = round(time.time() * 1000)
+        self._endtime = start + self._durationms
+        if self._deadline_rounds is None:
+            self._progress = ProgressTime(self._durationms, datetime.fromtimestamp(start / 1000))
+        else:
+            self._progress = ProgressRounds(
+                self._deadline_rounds, 0, datetime.fromtimestamp(self._endtime / 1000)
+            )
+
+        self._parties: List[DefaultParty] = []
+        self._connections: List[LocalConnection] = []
+        limited = any(
+            limit is not None
+            for limit in (self._turn_timeout_ms, self._time_budget_ms, self._cpu_budget_ms)
+        )
+        self._threads: Optional[List[PartyThread]] = [] if limited else None
+        # wall-clock and CPU time used per party in seconds
+        self._time_used = [0.0] * len(self._agents)
+        self._cpu_used = [0.0] * len(self._agents)
+        # parties that are still busy with a call that the engine stopped waiting for
+        self._busy = set()
+        self._actions: List[Action] = []
+        self._agreements = Agreements()
+        self._error = None
+        self._done = False
+        self._turn = 0
+        self._last_offer: Offer = None
+        try:
+            for party_id, agent in zip(self._party_ids, self._agents):
+                module_name, class_name = agent.rsplit(".", 1)
+                party = self._createParty(getattr(importlib.import_module(module_name), class_name))
+                connection = LocalConnection(party_id)
+                party.connect(connection)
+                self._parties.append(party)
+                self._connections.append(connection)
+                if self._threads is not None:
+                    self._threads.append(PartyThread(f"{party_id.getName()}-{class_name}"))
+
+            for index, party_id in enumerate(self._party_ids):
+                pwp = self._partyprofiles[party_id]
+                self._notify(
+                    index,
+                    Settings(
+                        party_id,
+                        pwp.getProfile(),
+                        ProtocolRef(URI("SAOP")),
+                        self._progress,
+                        pwp.getParty().getParameters(),
+                    ),
+                )
+        except Exception as e:
+            self._fail(e)
+
+    def isFinished(self) -> bool:
+        """Whether the session ended (agreement, end of negotiation, deadline or error)."""
+        return self._done or self._progress.isPastDeadline(round(time.time() * 1000))
+
+    def getTurn(self) -> int:
+        """Returns the index (in the list of agents) of the party that has the next turn."""
+        return self._turn
+
+    def step(self):
+        """Gives the next party its turn and handles its action."""
+        try:
+            self._step()
+        except Exception as e:
+            self._fail(e)
+
+    def finish(self):
+        """Sends `Finished` to all parties and creates the final state."""
+        for index in range(len(self._parties)):
+            # a party that is stuck in a call can not be informed
+            if index in self._busy:
+                continue
+            try:
+                self._notify(index, Finished(self._agreements))
+            except Exception as e:
+                if self._reporter is not None:
+                    self._reporter.log(logging.WARNING, "party failed to finish", e)
+        if self._threads is not None:
+            for thread in self._threads:
+                thread.close()
+
+        self._state = LocalSAOPState(
+            self._actions, self._partyprofiles, self._progress, self._agreements, self._error
+        )
+
+    def _step(self):
+        party_id = self._party_ids[self._turn]
+        self._notify(self._turn, YourTurn())
+        if self._done:
+            # the deadline passed during the turn
+            return
+
+        # every turn has to result in exactly one action of the party
+        sent = self._connections[self._turn].takeActions()
+        if len(sent) != 1:
+            raise ValueError(f"Party {party_id} sent {len(sent)} actions in its turn")
+        action = sent[0]
+        if action.getActor() != party_id:
+            raise ValueError(f"Party {party_id} sent an action of {action.getActor()}")
+        if isinstance(action, Offer) and action.getBid() is None:
+            raise ValueError(f"Party {party_id} offered an empty bid")
+        if isinstance(action, Accept) and (
+            self._last_offer is None or action.getBid() != self._last_offer.getBid()
+        ):
+            raise ValueError(f"Party {party_id} accepted a bid that was not offered last")
+
+        self._actions.append(action)
+        if isinstance(action, Accept):
+            self._agreements = Agreements({p: action.getBid() for p in self._party_ids})
+        if isinstance(action, Offer):
+            self._last_offer = action
+        if self._listener is not None:
+            self._listener(action)
+
+        for index in range(len(self._parties)):
+            self._notify(index, ActionDone(action))
+            if self._done:
+                return
+
+        if isinstance(action, (Accept, EndNegotiation)):
+            self._done = True
+            return
+
+        # a round is over when every party had its turn
+        self._turn = (self._turn + 1) % len(self._parties)
+        if self._turn == 0 and isinstance(self._progress, ProgressRounds):
+            self._progress = self._progress.advance()
+
+    def _createParty(self, party_class: type) -> DefaultParty:
+        """Creates a party, which logs to the reporter of the engine if its constructor
+        accepts a reporter. Other parties keep their own (stdout) reporter.
+
+        Args:
+            party_class (type): the class of the party.
+
+        Returns:
+            DefaultParty: the new party.
+        """
+        if self._reporter is not None and "reporter" in inspect.signature(party_class).parameters:
+            return party_class(reporter=self._reporter)
+        return party_class()
+
+    def _notify(self, index: int, info: Inform):
+        """Informs a party, within its limits if the session has any.
+
+        Raises:
+            TurnTimeout: the party exceeded its turn timeout or a budget.
+        """
+        party = self._parties[index]
+        if self._threads is None:
+            party.notifyChange(info)
+            return
+
+        party_id = self._party_ids[index].getName()
+        # wait until the first limit of the party, or the deadline, is reached
+        limits = [((self._endtime - time.time() * 1000) / 1000, None)]
+        if self._turn_timeout_ms is not None:
+            limits.append((self._turn_timeout_ms / 1000, f"turn timeout of {self._turn_timeout_ms} ms"))
+        if self._time_budget_ms is not None:
+            limits.append(
+                (self._time_budget_ms / 1000 - self._time_used[index], f"time budget of {self._time_budget_ms} ms")
+            )
+        timeout, exceeded = min(limits, key=lambda limit: limit[0])
+
+        start = time.perf_counter()
+        try:
+            cpu_time = self._threads[index].call(party.notifyChange, info, timeout)
+        except TimeoutError:
+            self._busy.add(index)
+            if exceeded is None:
+                # the deadline passed, the session ends without agreement as usual
+                self._done = True
+                return
+            raise TurnTimeout(f"{party_id} exceeded its {exceeded} in {type(info).__name__}")
+        finally:
+            self._time_used[index] += time.perf_counter() - start
+
+        self._cpu_used[index] += cpu_time
+        if self._cpu_budget_ms is not None and self._cpu_used[index] * 1000 > self._cpu_budget_ms:
+            raise TurnTimeout(f"{party_id} exceeded its CPU budget of {self._cpu_budget_ms} ms")
+
+    def _fail(self, error: Exception):
+        self._error = error
+        self._done = True
+        if self._reporter is not None:
+            self._reporter.log(logging.WARNING, "session ended with an error", error)
+
+
+def compare_traces(trace_a: dict, trace_b: dict) -> List[str]:
+    """Differences between the actions of two compact session traces (see
+    `utils.session_trace`), empty if they are the same.
+
+    Parties are compared by their position in the session (the order of the
+    "partyprofiles"), as engines name the parties differently: geniusweb numbers
+    the parties of all sessions in a process consecutively.
+    """
+    actions_a, actions_b = _positional_actions(trace_a), _positional_actions(trace_b)
+    differences = []
+    if len(actions_a) != len(actions_b):
+        differences.append(f"{len(actions_a)} actions vs {len(actions_b)} actions")
+    for i, (a, b) in enumerate(zip(actions_a, actions_b)):
+        for key in ("action", "actor", "bid", "utilities"):
+            if a[key] != b[key]:
+                differences.append(f"action {i} {key}: {a[key]} vs {b[key]}")
+
+    return differences
+
+
+def _positional_actions(trace: dict) -> List[dict]:
+    # actors and utilities by the position of the party instead of its id
+    parties = list(trace["partyprofiles"])
+    return [
+        {
+            "action": action["action"],
+            "actor": parties.index(action["actor"]),
+            "bid": action["bid"],
+            "utilities": [action["utilities"][party] for party in parties],
+        }
+        for action in trace["actions"]
+    ]
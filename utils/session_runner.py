@@ -0,0 +1,587 @@
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import traceback
+from typing import Iterator, List, Optional, Tuple
+
+from geniusweb.protocol.NegoSettings import NegoSettings
+from geniusweb.protocol.session.saop.SAOPState import SAOPState
+from geniusweb.simplerunner.ClassPathConnectionFactory import \
+    ClassPathConnectionFactory
+from geniusweb.simplerunner.NegoRunner import NegoRunner
+from pyson.ObjectMapper import ObjectMapper
+
+from utils.bid_index import get_bid_index
+from utils.buffered_reporter import BufferedReporter
+from utils.instrumentation import (original_classpath, pop_timings,
+                                   reset_timings, timed_classpath,
+                                   turn_statistics)
+from utils.saop_engine import SAOPEngine, TurnTimeout
+from utils.session_trace import TraceRecorder, build_trace, legacy_trace
+from utils.specials import get_pareto_index
+from utils.std_out_reporter import StdOutReporter
+from utils.trace_io import read_trace, write_trace
+from utils.warm_up import sessions_warm_up, warm_up
+
+# limits on the time of the agents in a session, only enforced by the local engine (see utils.saop_engine)
+#   turn_timeout_ms: maximum time of a single call to an agent
+#   time_budget_ms / cpu_budget_ms: maximum wall-clock / CPU time of all calls to an agent
+SESSION_LIMITS = ("turn_timeout_ms", "time_budget_ms", "cpu_budget_ms")
+# settings that a tournament passes on to all of its sessions
+TOURNAMENT_SESSION_SETTINGS = ("deadline_rounds", "deadline_time_ms", "engine") + SESSION_LIMITS
+# time that the process of a session with time limits gets on top of the deadline of the
+# session to start and finish, before it is killed (see run_isolated_session)
+ISOLATION_GRACE_MS = 10000
+# the processes of isolated sessions are forked from a single-threaded server process instead
+# of from the calling process, of which threads (e.g. of the reporters or the connections of
+# earlier sessions) can hold locks that a forked child would never see released
+_session_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if _session_context.get_start_method() == "forkserver":
+    _session_context.set_forkserver_preload(["utils.session_runner"])
+
+
+def run_session(settings) -> Tuple[dict, dict]:
+    """Runs a session and returns its compact trace and summary (see `process_results`).
+    A session with time limits of the agents runs in a child process, see
+    `run_isolated_session`."""
+    if any(settings.get(key, None) is not None for key in SESSION_LIMITS):
+        return run_isolated_session(settings)
+    check_session_settings(settings)
+    return _run_session(settings)
+
+
+def check_session_settings(settings: dict):
+    """Raises an error for settings that a session can not be run with, before any of it
+    starts (e.g. before the process of an isolated session is started)."""
+    agents = settings["agents"]
+    profiles = settings["profiles"]
+    parameters = settings.get("parameters", [{}, {}])
+    engine = settings.get("engine", "geniusweb")
+
+    # quick and dirty checks
+    assert isinstance(agents, list) and len(agents) == 2
+    assert isinstance(profiles, list) and len(profiles) == 2
+    assert isinstance(parameters, list) and len(parameters) == 2
+    assert engine in ("geniusweb", "local")
+    session_deadline(settings)
+    if settings.get("legacy_trace", False) and engine == "local":
+        raise ValueError("legacy traces can only be created by the geniusweb engine")
+    if engine == "geniusweb" and any(settings.get(key, None) is not None for key in SESSION_LIMITS):
+        raise ValueError("time limits of the agents are only enforced by the local engine")
+
+
+def run_isolated_session(settings: dict) -> Tuple[dict, dict]:
+    """Runs a session in a child process, which is killed if it does not finish within
+    the deadline of the session plus `ISOLATION_GRACE_MS`.
+
+    The local engine stops waiting for an agent that exceeds its time limits, but can
+    not stop the agent itself. Ending the process of the session takes such an agent
+    (and its threads) down, so that they do not pile up in the calling (e.g. long-lived
+    worker) process. A session that has to be killed ends as a timeout, with the actions
+    that its trace file got before (see `session_timeout_results`).
+    """
+    check_session_settings(settings)
+    # the seed is drawn here, so that a killed session still records it
+    seed, _ = session_seeds(settings)
+    settings = {**settings, "seed": seed}
+    _, durationms = session_deadline(settings)
+
+    # a trace file with a header after a timeout is the one streamed by the child process
+    trace_file = settings.get("trace_file", None)
+    if trace_file is not None and os.path.exists(trace_file):
+        os.remove(trace_file)
+
+    receiver, sender = _session_context.Pipe(duplex=False)
+    process = _session_context.Process(
+        target=_run_session_process, args=(settings, sender), name="session"
+    )
+    process.start()
+    sender.close()
+    finished = receiver.poll((durationms + ISOLATION_GRACE_MS) / 1000)
+    try:
+        if not finished:
+            # the child process stops writing the trace file before it is completed here
+            process.terminate()
+            process.join()
+            error = TurnTimeout(f"session did not finish within {durationms + ISOLATION_GRACE_MS} ms")
+            return session_timeout_results(settings, error)
+        try:
+            succeeded, result = receiver.recv()
+        except EOFError:
+            process.join()
+            raise RuntimeError(f"session process exited with code {process.exitcode}") from None
+    finally:
+        receiver.close()
+        # agents that still run (e.g. in threads that timed out) are stopped with the process
+        if finished:
+            process.join(1)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    if not succeeded:
+        raise result
+    return result
+
+
+def _run_session_process(settings: dict, sender):
+    try:
+        result = (True, _run_session(settings))
+    except Exception as e:
+        result = (False, e)
+    try:
+        sender.send(result)
+    except Exception:
+        # the exception of the session could not be pickled
+        sender.send((False, RuntimeError(repr(result[1]))))
+    sender.close()
+
+
+def session_timeout_results(settings: dict, error: TurnTimeout) -> Tuple[dict, dict]:
+    """Trace and summary of a session that was killed (see `run_isolated_session`).
+
+    The trace holds the actions that the session streamed to its trace file before it
+    was killed (see `utils.session_trace.TraceRecorder`), the trace file is completed
+    with the error and summary. Without trace file (or if the session was killed before
+    it wrote the header) the trace has no actions, it is written to a new trace file.
+    """
+    trace_file = settings.get("trace_file", None)
+    results_trace = None
+    if trace_file is not None and os.path.exists(trace_file):
+        try:
+            results_trace, _ = read_trace(trace_file)
+        except ValueError:
+            pass
+    if results_trace is None:
+        profiles_uri = [f"file:{x}" for x in settings["profiles"]]
+        results_trace = {
+            "partyprofiles": session_partyprofiles(settings["agents"], profiles_uri),
+            "actions": [],
+        }
+    results_trace["error"] = repr(error)
+    results_trace["seed"] = settings["seed"]
+    results_summary = summarize_trace(results_trace)
+    results_summary["seed"] = settings["seed"]
+
+    if trace_file is not None:
+        write_trace(trace_file, results_trace, results_summary)
+
+    return results_trace, results_summary
+
+
+def _run_session(settings: dict) -> Tuple[dict, dict]:
+    agents = settings["agents"]
+    profiles = settings["profiles"]
+    # a deadline in rounds, in time or both (see session_deadline)
+    rounds, durationms = session_deadline(settings)
+    # optional parameters per agent (e.g. {"fastutility": True} for time dependent agents)
+    parameters = settings.get("parameters", [{}, {}])
+    # optionally time every call to the agents (see utils.instrumentation)
+    instrument = settings.get("instrument", False)
+    # optionally write the log messages of the session to a file instead of the terminal, these
+    # are the messages of the runner and protocol and, with the local engine, of the agents
+    # that accept a reporter (see SAOPEngine), other agents keep logging to the terminal
+    log_file = settings.get("log_file", None)
+    log_level = settings.get("log_level", logging.INFO)
+    # the trace is compact by default (see utils.session_trace), the geniusweb json format on request
+    legacy = settings.get("legacy_trace", False)
+    # optionally write the trace to a trace file (see utils.trace_io), the local engine writes it
+    # while the session runs (see utils.session_trace.TraceRecorder), geniusweb's after the session
+    trace_file = settings.get("trace_file", None)
+    # "geniusweb" runs the session through geniusweb's NegoRunner, "local" through the
+    # lighter in-process engine of utils.saop_engine
+    engine = settings.get("engine", "geniusweb")
+    # optional time limits of the agents, a violation ends the session as a timeout
+    limits = {key: settings.get(key, None) for key in SESSION_LIMITS}
+    # the settings are checked by the caller (see check_session_settings)
+
+    # every agent gets its own seed, derived from the (recorded) seed of the session
+    seed, parameters = session_seeds(settings)
+
+    # file path to uri
+    profiles_uri = [f"file:{x}" for x in profiles]
+
+    if instrument:
+        reset_timings()
+        agents = [timed_classpath(agent) for agent in agents]
+
+    # created here, in the process of an isolated session, as a reporter has a thread
+    if log_file is None:
+        reporter = StdOutReporter()
+    else:
+        reporter = BufferedReporter(log_file, level=log_level)
+
+    recorder = None
+    if trace_file is not None and engine == "local":
+        recorder = session_recorder(trace_file, settings["agents"], profiles_uri, seed, instrument)
+
+    # run the negotiation session
+    try:
+        if engine == "local":
+            runner = SAOPEngine(
+                agents, profiles_uri, parameters, rounds, durationms, reporter, **limits, listener=recorder
+            )
+            runner.run()
+            results_class = runner.getState()
+        else:
+            results_class = run_geniusweb_session(
+                agents, profiles_uri, parameters, rounds, reporter, durationms
+            )
+    finally:
+        if log_file is not None:
+            reporter.close()
+
+    timings = None
+    if instrument:
+        timings = {
+            party.getName(): pop_timings(party.getName())
+            for party in results_class.getPartyProfiles()
+        }
+
+    results_trace, results_summary = session_results(results_class, timings, trace_file, seed, recorder)
+
+    if legacy:
+        results_trace = legacy_trace(results_class, results_trace)
+
+    return results_trace, results_summary
+
+
+def session_deadline(settings: dict) -> Tuple[Optional[int], int]:
+    """Returns the number of rounds of a session (None for a time based deadline) and
+    its maximum duration in milliseconds.
+
+    A session ends after "deadline_rounds" rounds, after "deadline_time_ms" milliseconds
+    or after whichever comes first if both are given. A deadline in rounds alone lasts
+    at most 60 seconds.
+    """
+    rounds = settings.get("deadline_rounds", None)
+    durationms = settings.get("deadline_time_ms", None)
+
+    # quick and dirty checks
+    assert rounds is not None or durationms is not None
+    assert rounds is None or (isinstance(rounds, int) and rounds > 0)
+    assert durationms is None or (isinstance(durationms, int) and durationms > 0)
+
+    return rounds, 60000 if durationms is None else durationms
+
+
+def session_seeds(settings: dict) -> Tuple[int, List[dict]]:
+    """Returns the seed of a session and the parameters of its agents, in which every
+    agent without a "seed" parameter gets a seed derived from the session seed.
+
+    The seed of the session is taken from the settings ("seed") or drawn at random,
+    it is recorded in the trace and summary so that the session can be reproduced.
+    """
+    seed = settings.get("seed", None)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    rng = random.Random(seed)
+    parameters = [
+        {"seed": rng.randrange(2 ** 32), **params}
+        for params in settings.get("parameters", [{}, {}])
+    ]
+    return seed, parameters
+
+
+def session_results(
+    results_class: SAOPState,
+    timings: dict = None,
+    trace_file: str = None,
+    seed: int = None,
+    recorder: TraceRecorder = None,
+) -> Tuple[dict, dict]:
+    """Creates the trace and summary of a finished session and optionally writes the trace
+    to a trace file (see `process_results` and `utils.trace_io`). If the actions were
+    already written during the session by a `recorder`, only its error and summary
+    are added to the trace file."""
+    # create a trace with the utilities of all actions and a summary
+    results_trace, results_summary = process_results(results_class, timings)
+
+    # report the original agents instead of their timed subclasses
+    for party in results_trace["partyprofiles"].values():
+        classpath = party["partyref"][len("pythonpath:"):]
+        party["partyref"] = f"pythonpath:{original_classpath(classpath)}"
+
+    if seed is not None:
+        results_trace["seed"] = seed
+        results_summary["seed"] = seed
+
+    if recorder is not None:
+        recorder.close(results_trace["error"], results_summary)
+    elif trace_file is not None:
+        write_trace(trace_file, results_trace, results_summary)
+
+    return results_trace, results_summary
+
+
+def session_recorder(
+    trace_file: str, agents: List[str], profiles_uri: List[str], seed: int = None, timed: bool = False
+) -> TraceRecorder:
+    """Recorder that writes the trace of a session with the local engine (see
+    `utils.saop_engine`) to a trace file while the session runs.
+
+    Args:
+        trace_file (str): path of the trace file.
+        agents (List[str]): classpaths of the (original, not the timed) agents.
+        profiles_uri (List[str]): uris of the profiles of the agents.
+        seed (int, optional): seed of the session. Defaults to None.
+        timed (bool, optional): the agents are instrumented. Defaults to False.
+    """
+    return TraceRecorder(trace_file, session_partyprofiles(agents, profiles_uri), seed, timed)
+
+
+def session_partyprofiles(agents: List[str], profiles_uri: List[str]) -> dict:
+    """The "partyprofiles" of the compact trace of a session with the local engine, which
+    names the parties after their position."""
+    return {
+        f"party_{position}": {"partyref": f"pythonpath:{agent}", "profile": profile}
+        for position, (agent, profile) in enumerate(zip(agents, profiles_uri), 1)
+    }
+
+
+def run_geniusweb_session(
+    agents: List[str],
+    profiles_uri: List[str],
+    parameters: List[dict],
+    rounds: Optional[int],
+    reporter,
+    durationms: int = 60000,
+) -> SAOPState:
+    """Runs a session through geniusweb's NegoRunner and returns its final state, with a
+    deadline in rounds (DeadlineRounds) or in time (DeadlineTime) if rounds is None."""
+    if rounds is None:
+        deadline = {"DeadlineTime": {"durationms": durationms}}
+    else:
+        deadline = {"DeadlineRounds": {"rounds": rounds, "durationms": durationms}}
+
+    # create full settings dictionary that geniusweb requires
+    settings_full = {
+        "SAOPSettings": {
+            "participants": [
+                {
+                    "TeamInfo": {
+                        "parties": [
+                            {
+                                "party": {
+                                    "partyref": f"pythonpath:{agents[0]}",
+                                    "parameters": parameters[0],
+                                },
+                                "profile": profiles_uri[0],
+                            }
+                        ]
+                    }
+                },
+                {
+                    "TeamInfo": {
+                        "parties": [
+                            {
+                                "party": {
+                                    "partyref": f"pythonpath:{agents[1]}",
+                                    "parameters": parameters[1],
+                                },
+                                "profile": profiles_uri[1],
+                            }
+                        ]
+                    }
+                },
+            ],
+            "deadline": deadline,
+        }
+    }
+
+    # parse settings dict to settings object
+    settings_obj = ObjectMapper().parse(settings_full, NegoSettings)
+
+    # create the negotiation session runner object and run the negotiation session
+    runner = NegoRunner(settings_obj, ClassPathConnectionFactory(), reporter, 0)
+    runner.run()
+
+    return runner.getProtocol().getState()
+
+
+def run_session_safe(settings: dict, isolated: bool = False) -> dict:
+    """Runs a single session and returns its summary, reports crashes as an error summary.
+    An `isolated` session runs in a child process (see `run_isolated_session`), so that
+    a crash of the process (e.g. a segfault) only ends this session."""
+    try:
+        if isolated:
+            _, results_summary = run_isolated_session(settings)
+        else:
+            _, results_summary = run_session(settings)
+    except Exception as e:
+        results_summary = session_error_summary(settings, e)
+
+    return results_summary
+
+
+def iter_sessions_serial(sessions: List[dict]) -> Iterator[Tuple[int, dict]]:
+    """Runs sessions one after the other in this process and yields (index, results_summary)
+    pairs. The agents and profiles are loaded before the first session (see
+    `utils.warm_up.warm_up`)."""
+    warm_up(*sessions_warm_up(sessions))
+    for index, settings in enumerate(sessions):
+        yield index, run_session_safe(settings)
+
+
+def session_error_summary(settings: dict, error: BaseException) -> dict:
+    print(
+        f"ERROR: session {settings['agents']} on {settings['profiles']} crashed:\n"
+        + "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+        file=sys.stderr,
+    )
+
+    results_summary = {}
+    for position, agent in enumerate(settings["agents"], 1):
+        results_summary[f"agent_{position}"] = agent.split(".")[-1]
+        results_summary[f"utility_{position}"] = 0
+    results_summary["nash_product"] = 0
+    results_summary["social_welfare"] = 0
+    results_summary["result"] = "ERROR"
+    results_summary["error"] = repr(error)
+
+    return results_summary
+
+
+def process_results(results_class: SAOPState, timings: dict = None) -> Tuple[dict, dict]:
+    """Builds the compact trace of a session (see `utils.session_trace`) and summarises it.
+
+    Args:
+        results_class (SAOPState): final state of the session.
+        timings (dict, optional): `utils.instrumentation.Timing` lists per party of an
+            instrumented session. Every action then gets the wall time of the YourTurn
+            in which it was made as "duration" and the summary gets the turn time
+            statistics, total CPU time and the calls and time per kind of Inform per
+            agent (see `utils.instrumentation.turn_statistics`). Defaults to None.
+    """
+    # obtain the index to score the bids with
+    profiles = [
+        str(pwp.getProfile().getURI())[len("file:"):]
+        for pwp in results_class.getPartyProfiles().values()
+    ]
+    index = get_bid_index(profiles)
+    durations = None
+    if timings is not None:
+        durations = {
+            party: [t.wall_time for t in party_timings if t.inform == "YourTurn"]
+            for party, party_timings in timings.items()
+        }
+    results_trace = build_trace(results_class, index, durations)
+    results_summary = summarize_trace(results_trace, len(results_class.getActions()))
+
+    if timings is not None:
+        positions = party_positions(results_trace["partyprofiles"])
+        for party, party_timings in timings.items():
+            position = positions[party]
+            for key, value in turn_statistics(party_timings).items():
+                results_summary[f"{key}_{position}"] = value
+
+    return results_trace, results_summary
+
+
+def summarize_trace(results_trace: dict, num_actions: int = None) -> dict:
+    """Summary of a session from its compact trace (see `utils.session_trace`).
+
+    Args:
+        results_trace (dict): the compact trace of the session.
+        num_actions (int, optional): number of actions of the session, including the
+            ones that are not in the trace. Defaults to the number of traced actions.
+    """
+    partyprofiles = results_trace["partyprofiles"]
+    if num_actions is None:
+        num_actions = len(results_trace["actions"])
+
+    # dict to translate geniusweb agent reference to Python class name
+    agent_translate = {k: v["partyref"].split(".")[-1] for k, v in partyprofiles.items()}
+    positions = party_positions(partyprofiles)
+
+    results_summary = {}
+
+    # check if there are any actions (could have crashed)
+    if results_trace["actions"]:
+        offer = results_trace["actions"][-1]
+        results_summary["num_offers"] = num_actions
+
+        # gather a summary of results
+        if offer["action"] == "Accept":
+            for actor, utility in offer["utilities"].items():
+                position = positions[actor]
+                results_summary[f"agent_{position}"] = agent_translate[actor]
+                results_summary[f"utility_{position}"] = utility
+            util_1, util_2 = offer["utilities"].values()
+            results_summary["nash_product"] = util_1 * util_2
+            results_summary["social_welfare"] = util_1 + util_2
+            results_summary.update(efficiency_metrics(partyprofiles, offer["utilities"]))
+            results_summary["result"] = "agreement"
+        else:
+            for actor, utility in offer["utilities"].items():
+                position = positions[actor]
+                results_summary[f"agent_{position}"] = agent_translate[actor]
+                results_summary[f"utility_{position}"] = 0
+            results_summary["nash_product"] = 0
+            results_summary["social_welfare"] = 0
+            # without agreement the outcome is the disagreement point
+            results_summary.update(
+                efficiency_metrics(partyprofiles, {actor: 0.0 for actor in offer["utilities"]})
+            )
+            results_summary["result"] = "failed"
+            if is_timeout(results_trace["error"]):
+                results_summary["result"] = "timeout"
+    else:
+        # something crashed crashed
+        for actor in partyprofiles:
+            position = positions[actor]
+            results_summary[f"agent_{position}"] = agent_translate[actor]
+            results_summary[f"utility_{position}"] = 0
+        results_summary["nash_product"] = 0
+        results_summary["social_welfare"] = 0
+        results_summary["result"] = "timeout" if is_timeout(results_trace["error"]) else "ERROR"
+
+    if results_summary["result"] == "timeout":
+        # which agent exceeded which limit
+        results_summary["error"] = results_trace["error"]
+
+    return results_summary
+
+
+def party_positions(partyprofiles: dict) -> dict:
+    """Position (1, 2) of every party of a session, by the order of its "partyprofiles".
+
+    The ids of the parties can not be used for this, geniusweb numbers the parties
+    consecutively over all sessions of a process (party_3 and party_4 in the second).
+    """
+    return {party: position for position, party in enumerate(partyprofiles, 1)}
+
+
+def is_timeout(error: Optional[str]) -> bool:
+    """Whether the error of a trace is an agent that exceeded its time (see `utils.saop_engine`)."""
+    return error is not None and error.startswith(f"{TurnTimeout.__name__}(")
+
+
+def efficiency_metrics(partyprofiles: dict, utilities: dict) -> dict:
+    """Distances of an outcome to the Pareto front, Nash point and Kalai point of
+    the domain, based on its specials file (see `utils.specials`).
+
+    Args:
+        partyprofiles (dict): the "partyprofiles" of the session results.
+        utilities (dict): utility of the outcome per party.
+    """
+    profile_uris = [partyprofiles[party]["profile"] for party in utilities]
+    if not all(uri.startswith("file:") for uri in profile_uris):
+        return {}
+
+    # specials list the utilities in the (sorted) order of the profile files
+    profiles = [uri[len("file:"):] for uri in profile_uris]
+    order = sorted(range(len(profiles)), key=lambda i: profiles[i])
+    util_1, util_2 = (list(utilities.values())[i] for i in order)
+    pareto_index = get_pareto_index([profiles[i] for i in order])
+
+    return {
+        "pareto_distance": pareto_index.getParetoDistance(util_1, util_2),
+        "nash_distance": pareto_index.getNashDistance(util_1, util_2),
+        "kalai_distance": pareto_index.getKalaiDistance(util_1, util_2),
+    }
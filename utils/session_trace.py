@@ -0,0 +1,169 @@
+from typing import Dict, Iterator, List, Optional
+
+from geniusweb.actions.Accept import Accept
+from geniusweb.actions.Action import Action
+from geniusweb.actions.Offer import Offer
+from geniusweb.protocol.session.saop.SAOPState import SAOPState
+from pyson.ObjectMapper import ObjectMapper
+
+from utils.bid_index import BidIndex, get_bid_index
+from utils.instrumentation import last_timing
+from utils.trace_io import TraceWriter
+
+# Compact trace of a session:
+#   {
+#       "partyprofiles": {"party_1": {"partyref": "pythonpath:...", "profile": "file:..."}, ...},
+#       "actions": [{"action": "Offer", "actor": "party_1", "bid": {issue: value}, "utilities": {party: utility}}, ...],
+#       "error": None,
+#   }
+# Only offers and accepts are recorded. Instrumented sessions add a "duration" to every action.
+
+
+def build_trace(
+    state: SAOPState,
+    index: BidIndex,
+    durations: Dict[str, List[float]] = None,
+) -> dict:
+    """Builds the compact trace of a finished session in a single pass over its actions.
+
+    Args:
+        state (SAOPState): final state of the session.
+        index (BidIndex): index of the domain of the (file) profiles of the parties.
+        durations (Dict[str, List[float]], optional): turn times per party id, which
+            are assigned in order to the actions of that party. Defaults to None.
+    """
+    partyprofiles = {
+        party.getName(): {
+            "partyref": str(pwp.getParty().getPartyRef().getURI()),
+            "profile": str(pwp.getProfile().getURI()),
+        }
+        for party, pwp in state.getPartyProfiles().items()
+    }
+
+    actions = [record for record in map(action_record, state.getActions()) if record is not None]
+    add_utilities(actions, index, partyprofiles)
+
+    if durations is not None:
+        # every action is the result of the next turn of its actor
+        turn_times = {party: iter(times) for party, times in durations.items()}
+        for record in actions:
+            record["duration"] = next(turn_times.get(record["actor"], iter(())), None)
+
+    error = state.getError()
+    return {
+        "partyprofiles": partyprofiles,
+        "actions": actions,
+        "error": None if error is None else repr(error),
+    }
+
+
+def action_record(action: Action) -> Optional[dict]:
+    """Compact record of an offer or accept without its utilities, None for other actions."""
+    if isinstance(action, Offer):
+        kind = "Offer"
+    elif isinstance(action, Accept):
+        kind = "Accept"
+    else:
+        return None
+
+    bid = action.getBid()
+    if bid is None:
+        raise ValueError(f"Found `None` value in sequence of actions: {action}")
+    return {
+        "action": kind,
+        "actor": action.getActor().getName(),
+        "bid": {issue: value.getValue() for issue, value in bid.getIssueValues().items()},
+    }
+
+
+def add_utilities(records: List[dict], index: BidIndex, partyprofiles: dict):
+    """Adds the utilities of all parties to compact action records."""
+    # the bids are encoded once and their utilities are computed at once per party
+    encoded = index.encodeValues([record["bid"] for record in records])
+    utilities = {
+        party: index.getUtilitiesEncoded(profile["profile"][len("file:"):], encoded).tolist()
+        for party, profile in partyprofiles.items()
+    }
+    for i, record in enumerate(records):
+        record["utilities"] = {party: utils[i] for party, utils in utilities.items()}
+
+
+class TraceRecorder:
+    """
+    Action listener of the local engine (see `utils.saop_engine`) that writes the
+    compact record of every offer and accept to a trace file as soon as it is made.
+    Every record of a `.jsonl` or `.jsonl.gz` trace file is flushed, so that
+    `utils.trace_io.read_trace` can read the file while the session runs (an `.npz`
+    file is still only written when the recorder is closed).
+
+    The records are the same as those of `build_trace`, including the durations of
+    an instrumented session (see `utils.instrumentation`).
+    """
+
+    def __init__(self, path: str, partyprofiles: dict, seed: int = None, timed: bool = False):
+        """
+        Args:
+            path (str): path of the trace file (see `utils.trace_io.TraceWriter`).
+            partyprofiles (dict): "partyprofiles" of the compact trace.
+            seed (int, optional): seed of the session. Defaults to None.
+            timed (bool, optional): the agents are instrumented, every action gets the
+                wall time of the YourTurn in which it was made. Defaults to False.
+        """
+        self._partyprofiles = partyprofiles
+        self._index = get_bid_index([p["profile"][len("file:"):] for p in partyprofiles.values()])
+        self._writer = TraceWriter(path, partyprofiles, self._index, seed)
+        self._timed = timed
+
+    def __call__(self, action: Action):
+        record = action_record(action)
+        if record is None:
+            return
+        add_utilities([record], self._index, self._partyprofiles)
+        if self._timed:
+            # the engine reports an action right after the turn of its actor
+            timing = last_timing(record["actor"], "YourTurn")
+            record["duration"] = None if timing is None else timing.wall_time
+        self._writer.write(record)
+
+    def close(self, error: str = None, summary: dict = None):
+        """Writes the error and summary of the finished session and closes the file."""
+        self._writer.close(error, summary)
+
+
+def legacy_trace(state: SAOPState, trace: dict) -> dict:
+    """The trace in the (larger) geniusweb json format of the `SAOPState`, with the
+    utilities and durations of the compact trace added to its offers and accepts."""
+    results_dict = ObjectMapper().toJson(state)["SAOPState"]
+
+    for party, profile in trace["partyprofiles"].items():
+        results_dict["partyprofiles"][party]["party"]["partyref"] = profile["partyref"]
+
+    records = iter(trace["actions"])
+    for action_dict in results_dict["actions"]:
+        for kind in ("Offer", "Accept"):
+            if kind in action_dict:
+                record = next(records)
+                action_dict[kind]["utilities"] = record["utilities"]
+                if "duration" in record:
+                    action_dict[kind]["duration"] = record["duration"]
+
+    return results_dict
+
+
+def trace_actions(results_trace: dict) -> Iterator[dict]:
+    """Yields the actions of a compact or legacy trace as compact action records."""
+    for action in results_trace["actions"]:
+        if "action" in action:
+            yield action
+            continue
+        for kind in ("Offer", "Accept"):
+            if kind in action:
+                record = {
+                    "action": kind,
+                    "actor": action[kind]["actor"],
+                    "bid": action[kind]["bid"]["issuevalues"],
+                    "utilities": action[kind]["utilities"],
+                }
+                if "duration" in action[kind]:
+                    record["duration"] = action[kind]["duration"]
+                yield record
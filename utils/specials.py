@@ -0,0 +1,234 @@
+import json
+import os
+import sys
+from bisect import bisect_left
+from functools import lru_cache
+from math import hypot, prod
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from utils.bid_index import (BidIndex, decimal_tables, domain_issues_values,
+                             read_profile)
+from utils.utility_tables import UtilityTables
+
+# domains up to this number of bids are enumerated completely (in memory), larger domains
+# get the frontier of their issues (see `issuewise_pareto_front`)
+MAX_ENUMERATE = 10 ** 4
+# number of candidate points that are generated at once when merging two frontiers
+MERGE_CHUNK = 2 ** 22
+
+
+def compute_specials(profiles: Sequence[str], max_enumerate: int = MAX_ENUMERATE) -> dict:
+    """Computes the Pareto front, Nash solution and Kalai-Smorodinsky solution of
+    two profiles, in the format of the `specials.json` files of the domains.
+
+    The frontier is combined from the frontiers of the individual issues, without
+    enumerating the bid space (see `issuewise_pareto_front`). Only small domains,
+    with at most `max_enumerate` bids, are enumerated completely in memory.
+
+    The disagreement point is at utility 0 for both parties. As in the bundled
+    specials, the Kalai solution is the Pareto optimal bid that is closest to
+    equal utilities (the profiles are normalised to a maximum utility of 1).
+    """
+    assert len(profiles) == 2
+
+    parsed = [read_profile(p) for p in profiles]
+    issues, values = domain_issues_values(parsed, profiles)
+
+    if prod(len(vs) for vs in values) <= max_enumerate:
+        index = BidIndex.build(profiles)
+        utils_1, utils_2 = (index.getUtilities(p) for p in profiles)
+        front = pareto_front_indices(utils_1, utils_2)
+        bids = index.getBids()[front]
+        utils_1, utils_2 = utils_1[front], utils_2[front]
+    else:
+        tables = [UtilityTables(decimal_tables(p, issues, values)) for p in parsed]
+        bids, totals_1, totals_2 = issuewise_pareto_front(
+            tables[0].getTables(), tables[1].getTables()
+        )
+        utils_1 = tables[0].toUtilities(totals_1)
+        utils_2 = tables[1].toUtilities(totals_2)
+
+    pareto_front = [
+        {
+            "bid": {issue: vs[i] for issue, vs, i in zip(issues, values, row)},
+            "utility": [float(u1), float(u2)],
+        }
+        for row, u1, u2 in zip(bids, utils_1, utils_2)
+    ]
+
+    # both solutions are Pareto optimal, so they are found on the frontier
+    nash = int(np.argmax(utils_1 * utils_2))
+    kalai = int(np.argmin(np.abs(utils_1 - utils_2)))
+
+    return {
+        "nash": pareto_front[nash],
+        "kalai": pareto_front[kalai],
+        "pareto_front": pareto_front,
+    }
+
+
+def load_specials(profiles: Sequence[str]) -> dict:
+    """Returns the specials of two profiles.
+
+    The bundled `specials.json` of a domain directory is used when the two profiles
+    are the only profiles in that directory, it is never overwritten (recompute it
+    explicitly with `python -m utils.specials`). Otherwise the specials are computed,
+    nothing is written to disk (`get_pareto_index` keeps them per process).
+
+    Args:
+        profiles (Sequence[str]): paths of the two profile files.
+    """
+    profiles = [os.path.normpath(p) for p in profiles]
+    domain_dir = os.path.dirname(profiles[0])
+
+    bundled_file = os.path.join(domain_dir, "specials.json")
+    if os.path.exists(bundled_file) and sorted(profiles) == domain_profiles(domain_dir):
+        with open(bundled_file, "r") as f:
+            return json.load(f)
+
+    return compute_specials(profiles)
+
+
+def domain_profiles(domain_dir: str) -> List[str]:
+    """Sorted paths of the profile files in a domain directory."""
+    return sorted(
+        os.path.normpath(os.path.join(domain_dir, f))
+        for f in os.listdir(domain_dir)
+        if f.endswith(".json") and "profile" in f
+    )
+
+
+class ParetoIndex:
+    """
+    Spatial index over the specials of a domain to compute the efficiency of an
+    outcome: its distance to the Pareto front, the Nash point and the Kalai point.
+
+    The frontier is kept sorted by the utility of the first profile (along which
+    the utility of the second profile decreases), so the nearest frontier point is
+    found with a bisection followed by a search outwards that stops as soon as the
+    horizontal distance alone exceeds the best distance found.
+    """
+
+    def __init__(self, specials: dict):
+        front = sorted(p["utility"] for p in specials["pareto_front"])
+        self._utils_1 = [u[0] for u in front]
+        self._utils_2 = [u[1] for u in front]
+        self._nash = specials["nash"]["utility"]
+        self._kalai = specials["kalai"]["utility"]
+
+    def getParetoDistance(self, util_1: float, util_2: float) -> float:
+        """Euclidean distance to the nearest Pareto optimal bid."""
+        best = float("inf")
+        start = bisect_left(self._utils_1, util_1)
+
+        for i in range(start, len(self._utils_1)):
+            if self._utils_1[i] - util_1 >= best:
+                break
+            best = min(best, hypot(self._utils_1[i] - util_1, self._utils_2[i] - util_2))
+        for i in range(start - 1, -1, -1):
+            if util_1 - self._utils_1[i] >= best:
+                break
+            best = min(best, hypot(self._utils_1[i] - util_1, self._utils_2[i] - util_2))
+
+        return best
+
+    def getNashDistance(self, util_1: float, util_2: float) -> float:
+        return hypot(self._nash[0] - util_1, self._nash[1] - util_2)
+
+    def getKalaiDistance(self, util_1: float, util_2: float) -> float:
+        return hypot(self._kalai[0] - util_1, self._kalai[1] - util_2)
+
+
+def get_pareto_index(profiles: Sequence[str]) -> ParetoIndex:
+    """Returns the (cached) `ParetoIndex` of two profile files, the utilities of an
+    outcome have to be passed in the same order as the profiles."""
+    profiles = tuple(os.path.normpath(p) for p in profiles)
+    return _get_pareto_index(profiles, tuple(os.stat(p).st_mtime_ns for p in profiles))
+
+
+@lru_cache(maxsize=64)
+def _get_pareto_index(profiles: Tuple[str, ...], _mtimes: Tuple[int, ...]) -> ParetoIndex:
+    return ParetoIndex(load_specials(profiles))
+
+
+def pareto_front_indices(utils_1: np.ndarray, utils_2: np.ndarray) -> np.ndarray:
+    """Indices of the Pareto optimal points sorted by ascending `utils_1`.
+
+    Sort-and-sweep: after sorting on descending `utils_1` (and descending
+    `utils_2` on ties), a point is Pareto optimal iff its `utils_2` is strictly
+    larger than that of every point before it. Of equal points only one is kept.
+    """
+    if len(utils_1) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    order = np.lexsort((-utils_2, -utils_1))
+    sorted_2 = utils_2[order]
+    keep = np.empty(len(order), dtype=bool)
+    keep[0] = True
+    keep[1:] = sorted_2[1:] > np.maximum.accumulate(sorted_2)[:-1]
+
+    return order[keep][::-1]
+
+
+def issuewise_pareto_front(
+    tables_1: List[np.ndarray], tables_2: List[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pareto front of a linear additive bid space from per-issue lookup tables.
+
+    The utilities of a bid are the sum of the (weighted) utilities of its issue
+    values, so the bid space is the Minkowski sum of the issues. The frontier of a
+    Minkowski sum only contains sums of frontier points of its parts, so the
+    frontiers of the issues are merged pairwise (divide and conquer), keeping only
+    the frontier after every merge.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: value indices of the frontier
+            bids and the summed table entries of both profiles, sorted by
+            ascending utility of the first profile.
+    """
+
+    def issue_front(table_1, table_2):
+        front = pareto_front_indices(table_1, table_2)
+        return front[:, None], table_1[front], table_2[front]
+
+    def merge(left, right):
+        rows_l, l_1, l_2 = left
+        rows_r, r_1, r_2 = right
+
+        # generate the candidate sums in chunks of left points to bound memory use
+        step = max(1, MERGE_CHUNK // len(r_1))
+        parts = []
+        for start in range(0, len(l_1), step):
+            stop = start + step
+            sum_1 = (l_1[start:stop, None] + r_1[None, :]).ravel()
+            sum_2 = (l_2[start:stop, None] + r_2[None, :]).ravel()
+            front = pareto_front_indices(sum_1, sum_2)
+            i, j = np.divmod(front, len(r_1))
+            rows = np.hstack((rows_l[start + i], rows_r[j]))
+            parts.append((rows, sum_1[front], sum_2[front]))
+
+        rows = np.vstack([p[0] for p in parts])
+        sum_1 = np.concatenate([p[1] for p in parts])
+        sum_2 = np.concatenate([p[2] for p in parts])
+        front = pareto_front_indices(sum_1, sum_2)
+        return rows[front], sum_1[front], sum_2[front]
+
+    def merge_range(start, stop):
+        if stop - start == 1:
+            return issue_front(tables_1[start], tables_2[start])
+        middle = (start + stop) // 2
+        return merge(merge_range(start, middle), merge_range(middle, stop))
+
+    return merge_range(0, len(tables_1))
+
+
+if __name__ == "__main__":
+    # (re)compute the specials of domain directories: python -m utils.specials domains/domain00 ...
+    for domain_dir in sys.argv[1:]:
+        profiles = domain_profiles(domain_dir)
+        specials = compute_specials(profiles)
+        with open(os.path.join(domain_dir, "specials.json"), "w") as f:
+            f.write(json.dumps(specials, indent=2))
+        print(f"{domain_dir}: {len(specials['pareto_front'])} Pareto optimal bids")
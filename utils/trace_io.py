@@ -0,0 +1,238 @@
+import gzip
+import json
+import os
+import sys
+import zlib
+from glob import glob
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from utils.bid_index import BidIndex, get_bid_index
+
+# bump when the layout of the trace files changes
+TRACE_VERSION = 1
+ACTIONS = ["Offer", "Accept"]
+# error of a trace file without footer, of a session that was killed or still runs
+INCOMPLETE_ERROR = "IncompleteTrace('the trace file has no footer')"
+
+# Trace files store the compact traces of `utils.session_trace` with the bids encoded by
+# `utils.bid_index.BidIndex`, of which the issues and values are listed once in the header:
+#   .jsonl / .jsonl.gz  a header line, one line per action and a footer line with the
+#                       error and summary of the session. Written while streaming,
+#                       every line is flushed as soon as it is written.
+#   .npz                (compressed) NumPy arrays of the actions, written when closed.
+
+
+class TraceWriter:
+    """
+    Writes the compact trace of a session to a trace file, one action at a time.
+
+    The format follows from the extension of the path: `.jsonl`, `.jsonl.gz` or
+    `.npz`. The bids are encoded with the index of the profiles of the parties,
+    unless another index of the same domain is given.
+    """
+
+    def __init__(self, path: str, partyprofiles: dict, index: BidIndex = None, seed: int = None):
+        if index is None:
+            index = get_bid_index([p["profile"][len("file:"):] for p in partyprofiles.values()])
+
+        self._path = path
+        self._parties = list(partyprofiles)
+        self._index = index
+        self._header = {
+            "version": TRACE_VERSION,
+            "partyprofiles": partyprofiles,
+            "issues": index.getIssues(),
+            "values": [index.getValues(issue) for issue in index.getIssues()],
+            "seed": seed,
+        }
+
+        self._binary = path.endswith(".npz")
+        if self._binary:
+            self._records = []
+        else:
+            opener = gzip.open if path.endswith(".gz") else open
+            self._file = opener(path, "wt")
+            self._writeLine(self._header)
+
+    def write(self, record: dict):
+        """Writes a compact action record (see `utils.session_trace`)."""
+        encoded = {
+            "action": ACTIONS.index(record["action"]),
+            "actor": self._parties.index(record["actor"]),
+            "bid": self._index.encodeValues([record["bid"]])[0].tolist(),
+            "utilities": [record["utilities"][party] for party in self._parties],
+        }
+        if "duration" in record:
+            encoded["duration"] = record["duration"]
+
+        if self._binary:
+            self._records.append(encoded)
+        else:
+            self._writeLine(encoded)
+
+    def close(self, error: str = None, summary: dict = None):
+        """Writes the footer with the error and summary of the session and closes the file."""
+        footer = {"error": error, "summary": summary}
+        if not self._binary:
+            self._writeLine(footer)
+            self._file.close()
+            return
+
+        records = self._records
+        arrays = {
+            "action": np.array([r["action"] for r in records], dtype=np.uint8),
+            "actor": np.array([r["actor"] for r in records], dtype=np.uint8),
+            "bid": np.array(
+                [r["bid"] for r in records], dtype=np.int16
+            ).reshape(len(records), len(self._index.getIssues())),
+            "utilities": np.array(
+                [r["utilities"] for r in records], dtype=np.float64
+            ).reshape(len(records), len(self._parties)),
+        }
+        if records and all("duration" in r for r in records):
+            arrays["duration"] = np.array(
+                [np.nan if r["duration"] is None else r["duration"] for r in records],
+                dtype=np.float64,
+            )
+        # header and footer are small, they are stored as json strings
+        arrays["header"] = np.array(json.dumps(self._header))
+        arrays["footer"] = np.array(json.dumps(footer))
+        np.savez_compressed(self._path, **arrays)
+
+    def _writeLine(self, obj: dict):
+        self._file.write(json.dumps(obj, separators=(",", ":")) + "\n")
+        # make every line readable while the session runs, for gzip this flushes the text
+        # buffer into `GzipFile.flush`, a zlib sync flush that ends on a byte boundary
+        self._file.flush()
+
+
+def write_trace(path: str, results_trace: dict, results_summary: dict = None):
+    """Writes a compact trace (and optionally its summary) to a trace file."""
+    writer = TraceWriter(path, results_trace["partyprofiles"], seed=results_trace.get("seed"))
+    for record in results_trace["actions"]:
+        writer.write(record)
+    writer.close(results_trace.get("error"), results_summary)
+
+
+def read_trace(path: str) -> Tuple[dict, dict]:
+    """Reads a trace file, returns the compact trace and the summary (None if absent).
+
+    A (streamed) trace file that ends before its footer, e.g. of a session that was
+    killed or still runs, is read up to its last complete action. Its trace gets
+    `INCOMPLETE_ERROR` as error. A file without header raises a ValueError.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as arrays:
+            header = json.loads(str(arrays["header"]))
+            footer = json.loads(str(arrays["footer"]))
+            durations = arrays["duration"].tolist() if "duration" in arrays else None
+            encoded = [
+                {"action": a, "actor": p, "bid": b, "utilities": u}
+                for a, p, b, u in zip(
+                    arrays["action"].tolist(),
+                    arrays["actor"].tolist(),
+                    arrays["bid"].tolist(),
+                    arrays["utilities"].tolist(),
+                )
+            ]
+        if durations is not None:
+            for record, duration in zip(encoded, durations):
+                record["duration"] = None if duration != duration else duration
+    else:
+        header, encoded, footer = _read_lines(path)
+
+    if header is None:
+        raise ValueError(f"{path} has no trace header")
+    if header["version"] != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version {header['version']} in {path}")
+
+    parties = list(header["partyprofiles"])
+    # the file lists the domain it was written with, the profiles may have changed since
+    profiles = [p["profile"][len("file:"):] for p in header["partyprofiles"].values()]
+    index = BidIndex(header["issues"], header["values"], profiles)
+    actions = []
+    for record in encoded:
+        action = {
+            "action": ACTIONS[record["action"]],
+            "actor": parties[record["actor"]],
+            "bid": index.decodeValues(record["bid"]),
+            "utilities": dict(zip(parties, record["utilities"])),
+        }
+        if "duration" in record:
+            action["duration"] = record["duration"]
+        actions.append(action)
+
+    results_trace = {
+        "partyprofiles": header["partyprofiles"],
+        "actions": actions,
+        "error": footer["error"],
+    }
+    if header.get("seed") is not None:
+        results_trace["seed"] = header["seed"]
+    return results_trace, footer["summary"]
+
+
+def _read_lines(path: str) -> Tuple[dict, List[dict], dict]:
+    """Header, encoded action records and footer of a .jsonl(.gz) trace file, which are
+    told apart by their keys, as the file may end anywhere while it is streamed."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        # unlike gzip.open, decompresses a stream that was cut off up to where it ends
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data)
+
+    header, encoded = None, []
+    footer = {"error": INCOMPLETE_ERROR, "summary": None}
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            # the last line was only partially written
+            break
+        if "version" in obj:
+            header = obj
+        elif "action" in obj:
+            encoded.append(obj)
+        elif "summary" in obj:
+            footer = obj
+
+    return header, encoded, footer
+
+
+def list_trace_files(paths: Sequence[str]) -> List[str]:
+    """Trace files of a list of trace files and/or directories, of which all trace
+    files are listed in sorted order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                sorted(
+                    f
+                    for pattern in ("*.jsonl", "*.jsonl.gz", "*.npz")
+                    for f in glob(os.path.join(path, pattern))
+                )
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def iter_traces(paths: Sequence[str]) -> Iterator[Tuple[str, dict, dict]]:
+    """Yields (path, results_trace, results_summary) of trace files one at a time. Files
+    without header (e.g. of a session that was killed before it wrote one) are skipped.
+
+    Args:
+        paths (Sequence[str]): trace files and/or directories, of which all trace
+            files are read in sorted order.
+    """
+    for file in list_trace_files(paths):
+        try:
+            results_trace, results_summary = read_trace(file)
+        except ValueError as e:
+            print(f"WARNING: skipped {file}: {e}", file=sys.stderr)
+            continue
+        yield file, results_trace, results_summary
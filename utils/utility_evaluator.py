@@ -0,0 +1,126 @@
+from decimal import Decimal
+from math import prod
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.issuevalue.Domain import Domain
+from geniusweb.issuevalue.Value import Value
+from geniusweb.profile.utilityspace.DiscreteValueSetUtilities import \
+    DiscreteValueSetUtilities
+from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
+
+from utils.utility_tables import UtilityTables
+
+
+class UtilityEvaluator:
+    """
+    NumPy backed evaluator of a linear additive utility space. Every issue is
+    turned into a lookup table of weighted value utilities (see `UtilityTables`),
+    so that the utilities of many bids are computed in a single batched operation.
+
+    It is also a drop-in float64 view of the profile for agents: `getUtility`
+    returns a float instead of a Decimal and skips all Decimal arithmetic. The
+    exact Decimal utilities remain available through `getProfile`.
+    """
+
+    def __init__(self, profile: LinearAdditive):
+        domain = profile.getDomain()
+        weights = profile.getWeights()
+        utilities = profile.getUtilities()
+
+        self._profile = profile
+        self._issues: List[str] = sorted(domain.getIssues())
+        self._values: List[List[Value]] = []
+        self._value_indices: List[Dict[Value, int]] = []
+
+        decimal_tables: List[List[Decimal]] = []
+        for issue in self._issues:
+            value_utilities = utilities[issue]
+            if not isinstance(value_utilities, DiscreteValueSetUtilities):
+                raise ValueError(f"Issue {issue} is not discrete, can not build a lookup table")
+            values = list(domain.getValues(issue))
+            self._values.append(values)
+            self._value_indices.append({value: i for i, value in enumerate(values)})
+            # last entry of every table is used for missing or unknown values
+            decimal_tables.append(
+                [weights[issue] * value_utilities.getUtility(value) for value in values]
+                + [Decimal(0)]
+            )
+
+        self._tables = UtilityTables(decimal_tables)
+        # plain dicts of Python numbers are faster than NumPy for a single bid
+        self._lookups: List[Dict[Value, object]] = [
+            dict(zip(values, table[:-1].tolist()))
+            for values, table in zip(self._values, self._tables.getTables())
+        ]
+
+    def getProfile(self) -> LinearAdditive:
+        """The wrapped profile, for exact Decimal utilities."""
+        return self._profile
+
+    def getDomain(self) -> Domain:
+        return self._profile.getDomain()
+
+    def getReservationBid(self) -> Optional[Bid]:
+        return self._profile.getReservationBid()
+
+    def getUtility(self, bid: Bid) -> float:
+        """Utility of a single bid as a float."""
+        total = 0
+        for issue, lookup in zip(self._issues, self._lookups):
+            total += lookup.get(bid.getValue(issue), 0)
+        return self._tables.toUtility(total)
+
+    def getIssues(self) -> List[str]:
+        """Issues in the order of the columns of encoded bids."""
+        return self._issues
+
+    def getValues(self, issue: str) -> List[Value]:
+        """Values of an issue in the order of their indices in encoded bids."""
+        return self._values[self._issues.index(issue)]
+
+    def encode(self, bids: Sequence[Bid]) -> np.ndarray:
+        """Encodes bids as a (num_bids, num_issues) matrix of value indices.
+
+        Missing and unknown values are encoded as the number of values of their issue.
+        """
+        encoded = np.empty((len(bids), len(self._issues)), dtype=np.int64)
+        for column, (issue, indices) in enumerate(zip(self._issues, self._value_indices)):
+            missing = len(indices)
+            encoded[:, column] = [
+                indices.get(bid.getValue(issue), missing) for bid in bids
+            ]
+        return encoded
+
+    def getUtilitiesEncoded(self, encoded: np.ndarray) -> np.ndarray:
+        """Utilities of a (num_bids, num_issues) matrix of value indices."""
+        return self._tables.getUtilities(encoded)
+
+    def getUtilities(self, bids: Sequence[Bid]) -> np.ndarray:
+        """Utilities of a sequence of bids as a float64 array."""
+        return self.getUtilitiesEncoded(self.encode(bids))
+
+    def size(self) -> int:
+        """Number of bids in the (complete) bid space."""
+        return prod(len(values) for values in self._values)
+
+    def getAllUtilities(self) -> np.ndarray:
+        """Utilities of all bids, where bid i is the mixed-radix number i over the
+        issues (first issue most significant, see `decode`)."""
+        return self._tables.getAllUtilities([len(values) for values in self._values])
+
+    def decode(self, number: int) -> Bid:
+        """Bid with mixed-radix number `number`, see `getAllUtilities`."""
+        number = int(number)
+        indices = []
+        for values in reversed(self._values):
+            number, i = divmod(number, len(values))
+            indices.append(i)
+        return Bid(
+            {
+                issue: values[i]
+                for issue, values, i in zip(self._issues, self._values, reversed(indices))
+            }
+        )
+
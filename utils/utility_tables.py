@@ -0,0 +1,96 @@
+from decimal import Decimal
+from typing import List, Sequence
+
+import numpy as np
+
+# largest integer that a float64 represents exactly
+_MAX_EXACT_INT = 2 ** 53
+
+
+class UtilityTables:
+    """
+    Lookup tables of the weighted value utilities of every issue, used to compute
+    the utilities of many encoded bids in a single batched operation.
+
+    The weighted value utilities of geniusweb are exact Decimals, the utilities are
+    always exactly `float(profile.getUtility(bid))`. When the tables fit in a fixed
+    point int64 representation (as for most profiles in this repository) the bids
+    are scored in integer arithmetic and converted to float in one correctly rounded
+    step. Otherwise (e.g. values like 0.363636363636363636 in the jobs domain) the
+    tables hold the Decimals themselves and are summed in (slower) Decimal
+    arithmetic, like geniusweb does.
+    """
+
+    def __init__(self, decimal_tables: List[List[Decimal]]):
+        self._scale = _fixed_point_scale(decimal_tables)
+        if self._scale is None:
+            self._tables = [np.array(t, dtype=object) for t in decimal_tables]
+        else:
+            self._tables = [
+                np.array([int(d.scaleb(self._scale)) for d in t], dtype=np.int64)
+                for t in decimal_tables
+            ]
+
+    def getTables(self) -> List[np.ndarray]:
+        """The lookup table of every issue, either fixed point int64 or Decimal objects.
+        Sums of table entries are turned into utilities with `toUtilities`."""
+        return self._tables
+
+    def toUtilities(self, total: np.ndarray) -> np.ndarray:
+        """Converts sums of table entries into float64 utilities."""
+        if self._scale is None:
+            # converting a Decimal to float is correctly rounded
+            return np.array([float(d) for d in total.tolist()], dtype=np.float64)
+        return total.astype(np.float64) / 10.0 ** self._scale
+
+    def toUtility(self, total) -> float:
+        """Converts a single sum of (Python number) table entries into a float utility."""
+        if self._scale is None:
+            return float(total)
+        # true division of Python ints is correctly rounded
+        return total / 10 ** self._scale
+
+    def getUtilities(self, encoded: np.ndarray) -> np.ndarray:
+        """Utilities of a (num_bids, num_issues) matrix of value indices."""
+        total = np.zeros(len(encoded), dtype=object if self._scale is None else np.int64)
+        for column, table in enumerate(self._tables):
+            total += table[encoded[:, column]]
+        return self.toUtilities(total)
+
+    def getAllUtilities(self, radices: Sequence[int]) -> np.ndarray:
+        """Utilities of all bids of a domain with `radices` values per issue, where bid i
+        is the mixed-radix number i over the issues (first issue most significant).
+        Entries of a table beyond its radix (e.g. for missing values) are ignored."""
+        num_bids = 1
+        for radix in radices:
+            num_bids *= radix
+        dtype = self._tables[0].dtype if self._tables else np.int64
+        total = np.zeros(num_bids, dtype=dtype)
+        stride = num_bids
+        for table, radix in zip(self._tables, radices):
+            stride //= radix
+            # every value is repeated for all combinations of the issues after it
+            total += np.tile(np.repeat(table[:radix], stride), num_bids // (stride * radix))
+        return self.toUtilities(total)
+
+
+def _fixed_point_scale(decimal_tables: List[List[Decimal]]):
+    """Returns the power of ten that turns all table entries into integers without
+    loss, or None if the tables can not be summed exactly in int64 arithmetic and
+    converted to float64 with a single division."""
+    scale = 0
+    for table in decimal_tables:
+        for d in table:
+            if not d.is_finite():
+                return None
+            scale = max(scale, -d.as_tuple().exponent)
+
+    # powers of ten above 10^22 are not exactly representable as float64
+    if scale > 22:
+        return None
+
+    max_total = sum(max(abs(int(d.scaleb(scale))) for d in table) for table in decimal_tables)
+    if max_total >= _MAX_EXACT_INT:
+        return None
+
+    return scale
@@ -0,0 +1,121 @@
+import importlib
+import os
+import sys
+import traceback
+from typing import Dict, List, Sequence, Tuple
+
+from utils.bid_index import get_bid_index
+from utils.profile_cache import get_utility_function, serve_profiles_from_cache
+from utils.specials import get_pareto_index
+
+# modification time of the source file of every module of the agent packages imported by this process
+_agent_modules: Dict[str, int] = {}
+
+
+def warm_up_worker(agents: Sequence[str], profile_sets: Sequence[Sequence[str]]):
+    """Initializer of worker processes: parses the profiles into the profile cache of the
+    worker, from which the agents get them (see
+    `utils.profile_cache.serve_profiles_from_cache`), and runs `warm_up`."""
+    serve_profiles_from_cache()
+    for profiles in profile_sets:
+        for profile in profiles:
+            try:
+                get_utility_function(f"file:{profile}")
+            except Exception:
+                # reported by warm_up (see below) and by the sessions that use the profile
+                pass
+    warm_up(agents, profile_sets)
+
+
+def warm_up(agents: Sequence[str], profile_sets: Sequence[Sequence[str]]):
+    """Imports the agent modules (and with them their dependencies) and loads the bid
+    index and the specials of the profile sets of this process.
+
+    Runs once before the first session (in a worker process, see `warm_up_worker`), so
+    that sessions do not pay for it (e.g. in their turn times or time limits). A failure
+    is reported and otherwise ignored, the sessions that need the agent or profile
+    report it as their error. The agents parse their profiles themselves, except in a
+    worker process.
+
+    Args:
+        agents (Sequence[str]): classpaths of the agents.
+        profile_sets (Sequence[Sequence[str]]): profile files of the sessions.
+    """
+    for agent in agents:
+        module_name = agent.rsplit(".", 1)[0]
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            print(f"WARNING: failed to import {module_name}:\n{traceback.format_exc()}", file=sys.stderr)
+    for package in _agent_packages(agents):
+        _track_modules(package)
+
+    for profiles in profile_sets:
+        try:
+            get_bid_index(profiles)
+            # in the order of `efficiency_metrics`
+            get_pareto_index(sorted(profiles))
+        except Exception:
+            print(f"WARNING: failed to load {profiles}:\n{traceback.format_exc()}", file=sys.stderr)
+
+
+def reload_changed_agents(agents: Sequence[str]) -> List[str]:
+    """Imports the packages of the agents (e.g. `agents`) again if the source file of any
+    of their modules changed since it was imported by this process, so a long-lived
+    worker runs the current code of an agent and of the modules it depends on (e.g.
+    the TimeDependentAgent of the Boulware agent). Dependencies outside the agent
+    packages (e.g. geniusweb) stay imported. Returns the modules that were dropped.
+    """
+    reloaded = []
+    for package in _agent_packages(agents):
+        modules = _package_modules(package)
+        if any(
+            name in _agent_modules and _agent_modules[name] != _source_mtime(module)
+            for name, module in modules.items()
+        ):
+            # reloading single modules would leave other modules with references to the
+            # old ones, the whole package is imported again in the order of its imports
+            for name in modules:
+                del sys.modules[name]
+                _agent_modules.pop(name, None)
+            importlib.invalidate_caches()
+            for agent in agents:
+                if _agent_package(agent) == package:
+                    importlib.import_module(agent.rsplit(".", 1)[0])
+            reloaded.extend(sorted(modules))
+        _track_modules(package)
+
+    return reloaded
+
+
+def sessions_warm_up(sessions: Sequence[dict]) -> Tuple[List[str], List[List[str]]]:
+    """The distinct agents and profile sets of sessions, the arguments of `warm_up`."""
+    agents = list(dict.fromkeys(agent for settings in sessions for agent in settings["agents"]))
+    profile_sets = list(dict.fromkeys(tuple(settings["profiles"]) for settings in sessions))
+    return agents, [list(profiles) for profiles in profile_sets]
+
+
+def _agent_package(agent: str) -> str:
+    return agent.split(".", 1)[0]
+
+
+def _agent_packages(agents: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(_agent_package(agent) for agent in agents))
+
+
+def _package_modules(package: str) -> dict:
+    return {
+        name: module
+        for name, module in list(sys.modules.items())
+        if name == package or name.startswith(f"{package}.")
+    }
+
+
+def _track_modules(package: str):
+    for name, module in _package_modules(package).items():
+        _agent_modules.setdefault(name, _source_mtime(module))
+
+
+def _source_mtime(module) -> int:
+    source = getattr(module, "__file__", None)
+    return os.stat(source).st_mtime_ns if source is not None else 0
@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Manager
+from typing import Iterator, List, Sequence, Tuple
+
+from utils.session_runner import run_session_safe, session_error_summary
+from utils.warm_up import (reload_changed_agents, sessions_warm_up,
+                           warm_up_worker)
+
+
+def run_warm_session(settings: dict, isolated: bool = False, index: int = None, running=None) -> dict:
+    """Runs a single session in a warm worker (see `run_session_safe`), with the
+    current code of its agents. While the session runs, its `index` is a key of
+    the (multiprocessing manager) dict `running`, if one is given."""
+    if running is not None:
+        running[index] = os.getpid()
+    try:
+        reload_changed_agents(settings["agents"])
+        return run_session_safe(settings, isolated)
+    finally:
+        if running is not None:
+            running.pop(index, None)
+
+
+class WorkerPool:
+    """
+    Pool of worker processes that are warmed up once (see `warm_up_worker`) and then take
+    session jobs from the queue of the pool. The pool can outlive a tournament: pass
+    it to several `run_tournament` calls to pay the startup cost of the agents only
+    once, agents (and the modules of their package) that are edited in between are
+    imported again by the workers.
+
+    Use it as a context manager or call `shutdown` when done.
+    """
+
+    def __init__(
+        self, workers: int, agents: Sequence[str] = (), profile_sets: Sequence[Sequence[str]] = ()
+    ):
+        """
+        Args:
+            workers (int): number of worker processes.
+            agents (Sequence[str], optional): classpaths of the agents to import in
+                every worker. Defaults to ().
+            profile_sets (Sequence[Sequence[str]], optional): profile files to load in
+                every worker. Defaults to ().
+        """
+        self._workers = workers
+        self._initargs = (list(agents), [list(profiles) for profiles in profile_sets])
+        # the sessions of `run_sessions` that run at the moment, by their index
+        self._manager = Manager()
+        self._running = self._manager.dict()
+        self._executor = self._create_executor()
+
+    def getWorkers(self) -> int:
+        return self._workers
+
+    def submit(self, settings: dict) -> Future:
+        """Queues a session, the future results in its summary. A pool that broke
+        because a worker process died is restarted first (see `restart`)."""
+        try:
+            return self._executor.submit(run_warm_session, settings)
+        except BrokenProcessPool:
+            self.restart()
+            return self._executor.submit(run_warm_session, settings)
+
+    def run_sessions(self, sessions: List[dict], isolated: bool = False) -> Iterator[Tuple[int, dict]]:
+        """Runs sessions and yields (index, results_summary) pairs in order of completion.
+
+        A worker process that dies (e.g. a segfault or the OOM killer) breaks the pool:
+        the other workers are killed and all unfinished sessions fail with it. The pool
+        is then restarted (see `restart`) and the unfinished sessions are queued again,
+        the ones that were running each in its own child process (see
+        `utils.session_runner.run_isolated_session`). That way only the session that crashed
+        ends in an ERROR. `isolated` runs every session in its own child process.
+        """
+        pending = dict(enumerate(sessions))
+        suspects = set(pending) if isolated else set()
+        while pending:
+            self._running.clear()
+            futures = {}
+            broken = None
+            for index, settings in pending.items():
+                try:
+                    future = self._submit(settings, index in suspects, index)
+                except BrokenProcessPool as e:
+                    if futures:
+                        # the pool broke while the sessions were queued, see below
+                        broken = e
+                        break
+                    # the pool broke before (e.g. a worker was killed while the pool was idle)
+                    self.restart()
+                    future = self._submit(settings, index in suspects, index)
+                futures[future] = index
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results_summary = future.result()
+                except BrokenProcessPool as e:
+                    broken = e
+                    continue
+                except Exception as e:
+                    results_summary = session_error_summary(sessions[index], e)
+                del pending[index]
+                yield index, results_summary
+
+            if broken is None:
+                break
+            running = [index for index in self._running.keys() if index in pending]
+            self.restart()
+            if not running:
+                # no session was running, the workers themselves could not start (e.g. in
+                # `warm_up_worker`) or an isolated session was queued when the pool broke
+                running = list(pending) if suspects.issuperset(pending) else []
+                suspects.update(pending)
+            for index in sorted(running):
+                if index in suspects:
+                    # the session crashed its worker while it ran on its own
+                    del pending[index]
+                    yield index, session_error_summary(sessions[index], broken)
+                else:
+                    suspects.add(index)
+
+    def restart(self):
+        """Replaces the worker processes by new (warmed up) ones."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+
+    def shutdown(self):
+        self._executor.shutdown()
+        self._manager.shutdown()
+
+    def _submit(self, settings: dict, isolated: bool, index: int) -> Future:
+        return self._executor.submit(run_warm_session, settings, isolated, index, self._running)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._workers, initializer=warm_up_worker, initargs=self._initargs)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def iter_sessions_pool(
+    sessions: List[dict], workers: int, pool: WorkerPool = None
+) -> Iterator[Tuple[int, dict]]:
+    """Runs sessions on a new pool of `workers` warm worker processes, or on the long-lived
+    `pool` if one is given, and yields (index, results_summary) pairs in order of
+    completion (see `WorkerPool.run_sessions`)."""
+    if pool is not None:
+        yield from pool.run_sessions(sessions)
+        return
+
+    with WorkerPool(workers, *sessions_warm_up(sessions)) as pool:
+        yield from pool.run_sessions(sessions)
+
+
+if __name__ == "__main__":
+    # rerun the tournament of run_tournament.py on a warm pool after every edit to an agent: python -m utils.worker_pool
+    from run_tournament import tournament_settings
+    from utils.results_store import ResultsTable, format_leaderboard
+    from utils.runners import run_tournament
+
+    workers = os.cpu_count() or 1
+    with WorkerPool(workers, tournament_settings["agents"], tournament_settings["profile_sets"]) as pool:
+        while True:
+            tournament, results_summaries = run_tournament(tournament_settings, pool=pool)
+            print(format_leaderboard(ResultsTable.fromSummaries(tournament, results_summaries).leaderboard()))
+            if input("Press enter to run the tournament again, q to quit: ").strip() == "q":
+                break